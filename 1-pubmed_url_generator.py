@@ -1,26 +1,27 @@
-import urllib.parse
+from urllib.parse import quote_plus, urlencode
+
+# 字段标签（已URL编码）
+TITLE_ABSTRACT_TAG = '%5BTitle%2FAbstract%5D'
+JOURNAL_TAG = '%5BJournal%5D'
+
+
+def _join_terms(terms, field_tag):
+    """将关键词逐个加引号编码并附加字段标签，使用+OR+连接"""
+    return "+OR+".join(f'%22{quote_plus(term.strip())}%22{field_tag}' for term in terms)
+
 
 def build_pubmed_url(pediatric_terms, surgical_terms, journals, size=200):
     # 处理儿科相关关键词（使用+OR+连接）
-    pediatric_query = "+OR+".join(
-        [f'%22{urllib.parse.quote_plus(term.strip())}%22%5BTitle%2FAbstract%5D'
-         for term in pediatric_terms]
-    )
+    pediatric_query = _join_terms(pediatric_terms, TITLE_ABSTRACT_TAG)
 
     # 处理外科相关关键词（使用+OR+连接）
-    surgical_query = "+OR+".join(
-        [f'%22{urllib.parse.quote_plus(term.strip())}%22%5BTitle%2FAbstract%5D'
-         for term in surgical_terms]
-    )
+    surgical_query = _join_terms(surgical_terms, TITLE_ABSTRACT_TAG)
 
     # 组合儿科和外科关键词，用AND连接
     combined_keywords = f"%28{pediatric_query}%29+AND+%28{surgical_query}%29"
 
     # 处理期刊部分（使用+OR+连接）
-    journal_query = "+OR+".join(
-        [f'%22{urllib.parse.quote_plus(j.strip())}%22%5BJournal%5D'
-         for j in journals]
-    )
+    journal_query = _join_terms(journals, JOURNAL_TAG)
 
     # 最终查询：(儿科关键词) AND (外科关键词) AND (期刊)
     full_query = f"{combined_keywords}+AND+%28{journal_query}%29"
@@ -28,23 +29,15 @@ def build_pubmed_url(pediatric_terms, surgical_terms, journals, size=200):
     # 基础URL
     base_url = "https://pubmed.ncbi.nlm.nih.gov/"
 
-    # 参数构建
+    # 参数构建（term已预先编码，原样传递）
     params = {
         "term": full_query,
         "sort": "",
         "size": size
     }
+    query = urlencode(params, quote_via=lambda value, *args, **kwargs: value)
 
-    # 处理参数
-    param_str = []
-    for k, v in params.items():
-        if isinstance(v, list):
-            for item in v:
-                param_str.append(f"{k}={item}")
-        else:
-            param_str.append(f"{k}={v}")
-
-    return f"{base_url}?{'&'.join(param_str)}"
+    return f"{base_url}?{query}"
 
 
 # 儿科相关关键词组
@@ -3,6 +3,11 @@ import numpy as np
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud, STOPWORDS
 import os
+import io
+import base64
+from html import escape
+
+from eps_export_utils import cairosvg  # 可选依赖（已安装但不可用时为None）：用于SVG→EPS转换
 
 # --------------------------
 # 1. 目录配置：读取自output，保存到svg和eps
@@ -33,9 +38,8 @@ except FileNotFoundError:
 df['PMID_Count'] = pd.to_numeric(df['PMID_Count'], errors='coerce')
 df = df.dropna(subset=['PMID_Count'])
 
-# 按作者分组计算总论文数（作为词云权重）
-author_papers = df.groupby('Author')['PMID_Count'].sum().reset_index()
-author_weights = dict(zip(author_papers['Author'], author_papers['PMID_Count']))
+# 按作者分组计算总论文数，取 log1p 压缩量级后作为词云权重
+author_weights = np.log1p(df.groupby('Author', sort=False)['PMID_Count'].sum()).to_dict()
 
 # --------------------------
 # 3. 词云配置（保留圆形掩码和视觉效果）
@@ -44,12 +48,12 @@ author_weights = dict(zip(author_papers['Author'], author_papers['PMID_Count']))
 width, height = 4000, 3000
 
 # 创建圆形掩码（词云显示为圆形）
-x, y = np.ogrid[:height, :width]
+# WordCloud 将值为255的像素视为遮挡区域，因此直接生成 uint8 掩码：圆外为255，圆内为0
 center_x, center_y = width // 2, height // 2
 radius = min(center_x, center_y) * 0.8  # 圆形半径为画布的80%
-center_mask = (x - center_y) ** 2 + (y - center_x) ** 2 <= radius ** 2
-mask = np.ones((height, width), dtype=bool)
-mask[center_mask] = False  # 中心区域为可显示区域
+rows = (np.arange(height, dtype=np.float32) - center_y)[:, None]
+cols = (np.arange(width, dtype=np.float32) - center_x)[None, :]
+mask = np.where(rows * rows + cols * cols > radius * radius, 255, 0).astype(np.uint8)
 
 # 配置词云参数
 wordcloud = WordCloud(
@@ -57,7 +61,7 @@ wordcloud = WordCloud(
     height=height,
     background_color='white',
     max_words=500,
-    mask=~mask,  # 应用圆形掩码
+    mask=mask,  # 应用圆形掩码
     contour_width=1,
     contour_color='steelblue',  # 圆形边框颜色
     prefer_horizontal=0.9,  # 90%的词水平显示
@@ -66,7 +70,7 @@ wordcloud = WordCloud(
     relative_scaling=0.6,  # 词频与字体大小的关联度
     min_font_size=8,
     max_font_size=200,
-    font_step=1,
+    font_step=4,  # 放不下时每次缩小4号字体，减少排版尝试次数
     regexp=r"\w[\w\s]*"  # 支持带空格的作者名
 )
 
@@ -74,46 +78,54 @@ wordcloud = WordCloud(
 wordcloud.generate_from_frequencies(author_weights)
 
 # --------------------------
-# 4. 绘制并保存图像（SVG 和 EPS）
+# 4. 保存图像（SVG 和 EPS）
 # --------------------------
-# 创建画布
-fig, ax = plt.subplots(1, 1, figsize=(width/100, height/100))
-
-# 显示词云
-ax.imshow(wordcloud, interpolation='bilinear')
-ax.axis('off')  # 隐藏坐标轴
-
-# 添加标题
-fig.suptitle(
-    'Word Cloud of Publications by Global Pediatric Surgery Experts(Top 500)',
-    fontsize=30,
-    y=0.98,
-    fontweight='bold'
+# 直接将词云位图嵌入SVG，不再经由matplotlib画布重新编码整幅图像
+title = 'Word Cloud of Publications by Global Pediatric Surgery Experts(Top 500)'
+title_height = 120  # 标题区域高度（像素）
+title_font_size = 42  # 约等于原画布上30磅字号
+
+png_buffer = io.BytesIO()
+wordcloud.to_image().save(png_buffer, format='PNG')
+png_base64 = base64.b64encode(png_buffer.getvalue()).decode('ascii')
+image_href = f"data:image/png;base64,{png_base64}"
+
+total_height = height + title_height
+svg_content = (
+    f'<svg xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink" '
+    f'width="{width}" height="{total_height}" viewBox="0 0 {width} {total_height}">'
+    f'<rect width="{width}" height="{total_height}" fill="white"/>'
+    f'<text x="{width / 2}" y="{title_height * 0.7}" text-anchor="middle" '
+    f'font-family="sans-serif" font-size="{title_font_size}" font-weight="bold">{escape(title)}</text>'
+    f'<image x="0" y="{title_height}" width="{width}" height="{height}" '
+    f'href="{image_href}" xlink:href="{image_href}"/>'
+    '</svg>'
 )
 
 # --- 保存 SVG ---
 svg_output_path = os.path.join(svg_save_dir, "author_publication_wordcloud.svg")
-plt.savefig(
-    svg_output_path,
-    format='svg',
-    bbox_inches='tight',
-    facecolor='white',
-    edgecolor='none'
-)
+with open(svg_output_path, 'w', encoding='utf-8') as f:
+    f.write(svg_content)
 print(f"✅ 词云SVG矢量图已保存至：")
 print(f"   {os.path.abspath(svg_output_path)}")
 
 # --- [新增] 保存 EPS ---
 eps_output_path = os.path.join(eps_save_dir, "author_publication_wordcloud.eps")
-plt.savefig(
-    eps_output_path,
-    format='eps',
-    bbox_inches='tight',
-    facecolor='white',
-    edgecolor='none'
-)
+if cairosvg is not None:
+    cairosvg.svg2eps(bytestring=svg_content.encode('utf-8'), write_to=eps_output_path)
+else:
+    # 未安装 cairosvg 时回退为 matplotlib 导出EPS
+    fig, ax = plt.subplots(1, 1, figsize=(width/100, height/100))
+    ax.imshow(wordcloud, interpolation='bilinear')
+    ax.axis('off')  # 隐藏坐标轴
+    fig.suptitle(title, fontsize=30, y=0.98, fontweight='bold')
+    fig.savefig(
+        eps_output_path,
+        format='eps',
+        bbox_inches='tight',
+        facecolor='white',
+        edgecolor='none'
+    )
+    plt.close(fig)
 print(f"✅ 词云EPS矢量图已保存至：")
 print(f"   {os.path.abspath(eps_output_path)}")
-
-# 可选：显示预览
-plt.show()
\ No newline at end of file
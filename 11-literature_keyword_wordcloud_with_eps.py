@@ -1,10 +1,35 @@
 import pandas as pd
 import ast
-from collections import Counter
 import matplotlib.pyplot as plt
 from wordcloud import WordCloud
 import os
 import re
+from itertools import chain
+from functools import lru_cache
+
+from eps_export_utils import save_eps_from_svg  # 公共的SVG→EPS导出（cairosvg不可用时回退为plt.savefig）
+
+# 词云最多显示的关键词数量
+MAX_WORDS = 300
+
+# 匹配括号及括号内的内容（含前导空白）
+PAREN_PATTERN = re.compile(r'\s*\(.*?\)')
+
+
+@lru_cache(maxsize=1 << 16)
+def _literal_eval_list(keywords_str):
+    """解析列表字符串并缓存结果（相同字符串只解析一次），返回不可变的元组"""
+    try:
+        keywords_list = ast.literal_eval(keywords_str)
+    except (ValueError, SyntaxError):
+        return ()
+    return tuple(keywords_list) if isinstance(keywords_list, list) else ()
+
+def parse_keywords_cell(keywords_str):
+    """将单元格中的列表字符串解析为关键词元组，解析失败或非列表时返回空元组"""
+    if not isinstance(keywords_str, str):
+        return ()
+    return _literal_eval_list(keywords_str)
 
 def normalize_keywords(keywords_list):
     """
@@ -12,24 +37,18 @@ def normalize_keywords(keywords_list):
     1. 去除括号及其内容
     2. 转换为标题格式 (Title Case)
     """
-    normalized_list = []
+    valid_keywords = [kw for kw in keywords_list if isinstance(kw, str) and kw.strip()]
+    if not valid_keywords:
+        return []
     
-    for keyword in keywords_list:
-        if not isinstance(keyword, str) or not keyword.strip():
-            continue
-            
-        # 1. 去除括号及括号内的内容
-        clean_keyword = re.sub(r'\s*\(.*?\)', '', keyword).strip()
-        
-        if not clean_keyword:
-            continue
-            
-        # 2. 首字母大写 (Title Case)
-        final_keyword = clean_keyword.title()
-        
-        normalized_list.append(final_keyword)
+    # 1. 去除括号及括号内的内容
+    keywords = pd.Series(valid_keywords, dtype='string')
+    keywords = keywords.str.replace(PAREN_PATTERN, '', regex=True).str.strip()
+    
+    # 2. 首字母大写 (Title Case)
+    keywords = keywords[keywords.str.len() > 0].str.title()
     
-    return normalized_list
+    return keywords.tolist()
 
 def create_keyword_wordcloud_spaced():
     # 1. 自动创建保存目录
@@ -52,18 +71,13 @@ def create_keyword_wordcloud_spaced():
         return
     
     # 3. 提取关键词
-    all_raw_keywords = []
-    for index, row in df.iterrows():
-        keywords_str = row.get('Keywords_and_MeSH_terms')
-        if isinstance(keywords_str, str):
-            try:
-                keywords_list = ast.literal_eval(keywords_str)
-                if isinstance(keywords_list, list):
-                    valid_keywords = [kw for kw in keywords_list 
-                                    if isinstance(kw, str) and kw.strip()]
-                    all_raw_keywords.extend(valid_keywords)
-            except (ValueError, SyntaxError):
-                continue
+    if 'Keywords_and_MeSH_terms' in df.columns:
+        keywords_series = df['Keywords_and_MeSH_terms'].dropna()
+    else:
+        keywords_series = pd.Series(dtype=object)
+    parsed_lists = keywords_series.map(parse_keywords_cell)
+    all_raw_keywords = [kw for kw in chain.from_iterable(parsed_lists)
+                        if isinstance(kw, str) and kw.strip()]
     
     if not all_raw_keywords:
         print("❌ 错误：没有找到有效关键词")
@@ -71,9 +85,10 @@ def create_keyword_wordcloud_spaced():
     
     # 4. 归一化处理
     normalized_keywords = normalize_keywords(all_raw_keywords)
-    keyword_freq = Counter(normalized_keywords)
+    keyword_counts = pd.Series(normalized_keywords, dtype=object).value_counts()
+    keyword_freq = keyword_counts.head(MAX_WORDS).to_dict()
     
-    print(f"统计完毕：共 {len(normalized_keywords)} 个关键词，{len(keyword_freq)} 个唯一词汇")
+    print(f"统计完毕：共 {len(normalized_keywords)} 个关键词，{len(keyword_counts)} 个唯一词汇")
     
     # 5. 创建优化间距的高清词云
     wordcloud = WordCloud(
@@ -81,7 +96,7 @@ def create_keyword_wordcloud_spaced():
         height=1000, # 稍微加大画布高度
         background_color='white',
         
-        max_words=300,
+        max_words=MAX_WORDS,
         
         colormap='viridis',
         
@@ -110,7 +125,7 @@ def create_keyword_wordcloud_spaced():
 
     # 保存 EPS
     eps_path = 'eps/keyword_wordcloud.eps'
-    plt.savefig(eps_path, format='eps', bbox_inches='tight', dpi=300)
+    save_eps_from_svg(svg_path, eps_path, bbox_inches='tight', dpi=300)
     print(f"✅ 优化间距后的高清EPS已保存至: {eps_path}")
 
     plt.close()
@@ -2,6 +2,12 @@ import pandas as pd
 import matplotlib.pyplot as plt
 import os
 import numpy as np
+import re
+from csv_encoding_utils import read_csv_with_fallback  # 公共的编码检测与回退读取
+from eps_export_utils import save_eps_from_svg  # 公共的SVG→EPS导出（cairosvg不可用时回退为plt.savefig）
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
 
 def plot_journals_with_pie_and_bar_solve_overlap():
     # 基础配置
@@ -57,15 +63,8 @@ def plot_journals_with_pie_and_bar_solve_overlap():
         # --------------------------
         # 2. 读取数据
         # --------------------------
-        try:
-            df = pd.read_csv(csv_file_path, encoding='utf-8')
-        except UnicodeDecodeError:
-            print("⚠️ UTF-8 读取失败，尝试 GBK 编码...")
-            try:
-                df = pd.read_csv(csv_file_path, encoding='gbk')
-            except UnicodeDecodeError:
-                print("⚠️ GBK 读取失败，尝试 Latin-1 编码...")
-                df = pd.read_csv(csv_file_path, encoding='latin1')
+        # 先检测编码再读取，解码失败时依次回退到 GBK、Latin-1
+        df = read_csv_with_fallback(csv_file_path)
         
         print(f"✅ 成功读取文件，共 {len(df)} 行数据")
 
@@ -76,8 +75,12 @@ def plot_journals_with_pie_and_bar_solve_overlap():
         # --------------------------
         # 3. 数据统计与处理
         # --------------------------
-        df["Journal_Clean"] = df["Journal"].astype(str).str.strip().str.replace(r'\s+', ' ', regex=True)
-        df["Journal_Full"] = df["Journal_Clean"].map(journal_mapping).fillna(df["Journal_Clean"])
+        # 单次遍历：合并空白、去首尾空格并映射为期刊全称（未收录的保留清洗后的名称）
+        def to_full_journal_name(journal):
+            journal_clean = WHITESPACE_PATTERN.sub(' ', journal).strip()
+            return journal_mapping.get(journal_clean, journal_clean)
+
+        df["Journal_Full"] = df["Journal"].astype(str).map(to_full_journal_name)
 
         journal_counts = df["Journal_Full"].value_counts().reset_index()
         journal_counts.columns = ["Journal", "Paper_Count"]
@@ -185,7 +188,7 @@ def plot_journals_with_pie_and_bar_solve_overlap():
         print(f"✅ SVG 已保存: {svg_path}")
 
         eps_path = f"./eps/{file_base_name}.eps"
-        plt.savefig(eps_path, format='eps', bbox_inches='tight', facecolor='white')
+        save_eps_from_svg(svg_path, eps_path, bbox_inches='tight', facecolor='white')
         print(f"✅ EPS 已保存: {eps_path}")
 
     except FileNotFoundError:
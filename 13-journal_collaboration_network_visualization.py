@@ -1,11 +1,20 @@
-import csv
 import re
 import os
+import pickle
+import pandas as pd
+from collections import Counter
+from itertools import combinations
 import networkx as nx
 import matplotlib.pyplot as plt
 from matplotlib.colors import LinearSegmentedColormap
 import numpy as np
 
+from eps_export_utils import save_eps_from_svg  # 公共的SVG→EPS导出（cairosvg不可用时回退为plt.savefig）
+
+# 从PMID列中提取数字PMID
+PMID_PATTERN = re.compile(r'\d+')
+
+
 # ----------------------
 # 全局配置
 # ----------------------
@@ -55,70 +64,55 @@ pubmed_file = 'output/pubmed_results_with_keywords_processed.csv'
 pmid_col = 'PMID'
 journal_col = 'Journal'
 
-pmid_to_journal = {} 
-journal_paper_count = {} 
-
 try:
-    with open(pubmed_file, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            pmid = str(row[pmid_col].strip())
-            journal_abbr = row[journal_col].strip()
-            
-            if journal_abbr in journal_impact_factors:
-                pmid_to_journal[pmid] = journal_abbr
-                journal_paper_count[journal_abbr] = journal_paper_count.get(journal_abbr, 0) + 1
+    papers_df = pd.read_csv(pubmed_file, usecols=[pmid_col, journal_col], dtype=str, encoding='utf-8-sig').dropna()
 except FileNotFoundError:
     print(f"❌ 未找到文件: {pubmed_file}")
     exit()
 
+papers_df[pmid_col] = papers_df[pmid_col].str.strip()
+papers_df[journal_col] = papers_df[journal_col].str.strip()
+papers_df = papers_df[papers_df[journal_col].isin(journal_impact_factors)]
+
+pmid_to_journal = dict(zip(papers_df[pmid_col], papers_df[journal_col]))
+journal_paper_count = papers_df[journal_col].value_counts(sort=False).to_dict()
+
 # ----------------------
 # 2. 处理作者数据，计算期刊合作关系
 # ----------------------
 author_file = 'output/author_info_processed_updated.csv'
 author_pmid_col = 'PMID'
 
-journal_cooperation = {}
+journal_cooperation = Counter()
 
 try:
-    with open(author_file, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                pmid_count = int(row['PMID_Count'])
-                if pmid_count < 2:
-                    continue
-                pmid_str = row.get(author_pmid_col, '').strip()
-                pmids = re.findall(r'\d+', pmid_str)
-                pmids = [str(pmid) for pmid in pmids]
-                
-                journals = {pmid_to_journal[pmid] for pmid in pmids if pmid in pmid_to_journal}
-                
-                if len(journals) >= 2:
-                    journal_list = sorted(list(journals))
-                    for i in range(len(journal_list)):
-                        for j in range(i + 1, len(journal_list)):
-                            j1, j2 = journal_list[i], journal_list[j]
-                            journal_cooperation[(j1, j2)] = journal_cooperation.get((j1, j2), 0) + 1
-            except (KeyError, ValueError):
-                continue
+    authors_df = pd.read_csv(author_file, usecols=[author_pmid_col, 'PMID_Count'], dtype=str, encoding='utf-8-sig')
 except FileNotFoundError:
     print(f"❌ 未找到文件: {author_file}")
     exit()
 
+# 只保留发文量不少于2篇的作者
+pmid_counts = pd.to_numeric(authors_df['PMID_Count'], errors='coerce')
+multi_paper_pmids = authors_df.loc[pmid_counts >= 2, author_pmid_col].fillna('')
+
+for pmid_str in multi_paper_pmids:
+    pmids = set(PMID_PATTERN.findall(pmid_str))
+    
+    journals = {journal for journal in map(pmid_to_journal.get, pmids) if journal is not None}
+    
+    if len(journals) >= 2:
+        journal_cooperation.update(combinations(sorted(journals), 2))
+
 # ----------------------
 # 3. 绘制网络图
 # ----------------------
 G = nx.Graph()
 
-# 添加节点
-for journal in journal_paper_count:
-    size = journal_paper_count[journal] * 15  
-    G.add_node(journal, size=size)
+# 添加节点（先于边批量添加，保持节点顺序与期刊出现顺序一致）
+G.add_nodes_from((journal, {'size': count * 15}) for journal, count in journal_paper_count.items())
 
-# 添加边
-for (j1, j2), weight in journal_cooperation.items():
-    G.add_edge(j1, j2, weight=weight)
+# 批量添加边
+G.add_weighted_edges_from((j1, j2, weight) for (j1, j2), weight in journal_cooperation.items())
 
 # 移除孤立节点
 isolates = list(nx.isolates(G))
@@ -133,26 +127,47 @@ colors = [(0.7, 0.8, 1), (0, 0, 0.8)]
 cmap = LinearSegmentedColormap.from_list('if_cmap', colors, N=100)
 
 # 获取节点颜色
-node_colors = []
-for node in G.nodes:
-    if_val = journal_impact_factors.get(node, min_if) 
-    norm_val = (if_val - min_if) / (max_if - min_if) if max_if > min_if else 0
-    node_colors.append(cmap(norm_val))
+node_ifs = np.array([journal_impact_factors.get(node, min_if) for node in G.nodes], dtype=np.float64)
+if max_if > min_if:
+    norm_vals = np.clip((node_ifs - min_if) / (max_if - min_if), 0, 1)
+else:
+    norm_vals = np.zeros_like(node_ifs)
+node_colors = cmap(norm_vals)  # (N, 4) RGBA 数组，一次性完成颜色映射
 
 node_sizes = [G.nodes[node]['size'] for node in G.nodes]
 
 if G.edges():
-    edge_weights = [G[u][v]['weight'] for u, v in G.edges()]
-    edge_widths = [2 * np.log(w) + 1 for w in edge_weights]  
+    edge_weights = np.fromiter((w for _, _, w in G.edges(data='weight')), dtype=np.float64, count=G.number_of_edges())
+    edge_widths = (2 * np.log(edge_weights) + 1).tolist()
 else:
     edge_widths = []
 
 # ----------------------------------------------------
 # 布局与坐标微调
 # ----------------------------------------------------
-print("⏳ 正在计算布局...")
-# 1. 使用 kamada_kawai_layout (比较舒展)
-pos = nx.kamada_kawai_layout(G)
+# 1. 使用 kamada_kawai_layout (比较舒展)，结果缓存到磁盘，图结构未变时直接复用
+layout_cache = 'output/journal_layout.pkl'
+graph_key = (
+    tuple(sorted(G.nodes)),
+    tuple(sorted((min(u, v), max(u, v), d['weight']) for u, v, d in G.edges(data=True)))
+)
+pos = None
+if os.path.exists(layout_cache):
+    try:
+        with open(layout_cache, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get('graph_key') == graph_key:
+            pos = cached['pos']
+            print(f"♻️ 已从缓存加载布局: {layout_cache}")
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pos = None
+
+if pos is None:
+    print("⏳ 正在计算布局...")
+    pos = nx.kamada_kawai_layout(G)
+    os.makedirs(os.path.dirname(layout_cache), exist_ok=True)
+    with open(layout_cache, 'wb') as f:
+        pickle.dump({'graph_key': graph_key, 'pos': pos}, f)
 
 # 2. 手动调整特定节点位置
 target_node = 'J Pediatr Surg'
@@ -222,7 +237,7 @@ print(f"✅ 网络图(SVG) 已保存至 {svg_path}")
 
 # 保存 EPS
 eps_path = 'eps/journal_collaboration_network_large_font.eps'
-plt.savefig(eps_path, format='eps', bbox_inches='tight', dpi=300)
+save_eps_from_svg(svg_path, eps_path, bbox_inches='tight', dpi=300)
 print(f"✅ 网络图(EPS) 已保存至 {eps_path}")
 
 plt.close()
\ No newline at end of file
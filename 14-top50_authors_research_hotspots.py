@@ -1,13 +1,19 @@
 import pandas as pd
 import ast
 from collections import Counter
+from functools import lru_cache
 import os
+from csv_encoding_utils import detect_file_encoding, read_csv_with_fallback  # 公共的编码检测与回退读取
 
 # ---------------- 配置区域 ----------------
 AUTHOR_FILE = 'output/author_info_processed_updated.csv'
 PUBMED_FILE = 'output/pubmed_results_with_keywords.csv'
 OUTPUT_FILE = 'output/top_50_authors_research_hotspots.csv'
 
+# 只读取后续用到的列
+AUTHOR_COLUMNS = ['Author', 'AuthorID', 'PMID', 'PMID_Count', 'MainAffiliation', 'Country']
+PAPER_COLUMNS = ['PMID', 'Keywords_and_MeSH_terms', 'MeSH_API']
+
 EXCLUDE_KEYWORDS = {
     'Pediatric Patients', 'Child', 'Male', 'Female', 'Humans', 'Childs',
     'postoperative complications', 'Retrospective Studies', 'Treatment Outcome',
@@ -17,104 +23,101 @@ EXCLUDE_KEYWORDS = {
     'Risk Factors', 'United States', 'Quality of Life'
 }
 
-def parse_list_string(list_str):
-    if pd.isna(list_str) or list_str == '':
-        return []
+@lru_cache(maxsize=1 << 16)
+def _literal_eval_list(list_str):
+    """解析列表字符串并缓存结果（相同字符串只解析一次），返回不可变的元组"""
     try:
         parsed = ast.literal_eval(list_str)
-        if isinstance(parsed, list):
-            return parsed
-        return []
     except (ValueError, SyntaxError):
-        return []
+        return ()
+    return tuple(parsed) if isinstance(parsed, list) else ()
 
-def get_keywords_for_paper(row):
+def parse_list_string(list_str):
+    if pd.isna(list_str) or list_str == '':
+        return ()
+    return _literal_eval_list(list_str)
+
+def get_keywords_for_paper(kw_mesh_str, mesh_api_str):
     # 1. 尝试获取交集关键词
-    kw_mesh_inter = parse_list_string(row.get('Keywords_and_MeSH_terms', ''))
+    kw_mesh_inter = parse_list_string(kw_mesh_str)
     if kw_mesh_inter:
         return kw_mesh_inter
     
     # 2. 回退策略：使用 MeSH_API 并过滤
-    mesh_api = parse_list_string(row.get('MeSH_API', ''))
+    mesh_api = parse_list_string(mesh_api_str)
     if mesh_api:
-        filtered_mesh = [
+        filtered_mesh = tuple(
             term for term in mesh_api 
             if term not in EXCLUDE_KEYWORDS
-        ]
+        )
         return filtered_mesh
-    return []
+    return ()
 
-def read_csv_robust(file_path):
+def read_csv_robust(file_path, columns=None, dtype=None, missing_value=None):
     """
-    尝试多种编码格式读取 CSV 文件，解决 UnicodeDecodeError
+    先检测编码再读取 CSV 文件，检测结果解码失败时依次回退为 GBK、ISO-8859-1
+    columns: 需要读取的列名列表，文件中缺失的列以 missing_value 补齐
     """
-    encodings = ['utf-8', 'gbk', 'ISO-8859-1', 'cp1252']
-    for encoding in encodings:
-        try:
-            return pd.read_csv(file_path, encoding=encoding)
-        except UnicodeDecodeError:
-            continue
-        except FileNotFoundError:
-            print(f"错误：找不到文件 - {file_path}")
-            return None
-    print(f"错误：无法解码文件 {file_path}，请检查文件格式。")
-    return None
+    try:
+        encoding = detect_file_encoding(file_path)
+    except FileNotFoundError:
+        print(f"错误：找不到文件 - {file_path}")
+        return None
+
+    usecols = (lambda col: col in columns) if columns else None
+    df = read_csv_with_fallback(file_path, encoding=encoding, usecols=usecols, dtype=dtype)
+    return df.reindex(columns=columns, fill_value=missing_value) if columns else df
 
 def main():
     print("正在读取数据...")
     
     # --- 修改点：使用增强的读取函数 ---
-    df_authors = read_csv_robust(AUTHOR_FILE)
-    df_papers = read_csv_robust(PUBMED_FILE)
+    df_authors = read_csv_robust(AUTHOR_FILE, columns=AUTHOR_COLUMNS, dtype={'PMID': str}, missing_value='N/A')
+    df_papers = read_csv_robust(PUBMED_FILE, columns=PAPER_COLUMNS, dtype=str)
 
     if df_authors is None or df_papers is None:
         return
 
     # --- 步骤 1: 构建 PMID -> 关键词 的映射字典 ---
     print("正在构建论文关键词索引...")
-    pmid_to_keywords = {}
-    
     # 确保 PMID 统一为字符串格式
     df_papers['PMID'] = df_papers['PMID'].astype(str)
     
-    for _, row in df_papers.iterrows():
-        pmid = row['PMID']
-        keywords = get_keywords_for_paper(row)
-        pmid_to_keywords[pmid] = keywords
+    pmid_to_keywords = {
+        pmid: get_keywords_for_paper(kw_mesh_str, mesh_api_str)
+        for pmid, kw_mesh_str, mesh_api_str in df_papers[PAPER_COLUMNS].itertuples(index=False, name=None)
+    }
 
     # --- 步骤 2: 获取发文量前 50 的作者 ---
     print("正在筛选前 50 名作者...")
     df_authors['PMID_Count'] = pd.to_numeric(df_authors['PMID_Count'], errors='coerce').fillna(0)
     
-    top_50_authors = df_authors.sort_values(by='PMID_Count', ascending=False).head(50)
+    top_50_authors = df_authors.nlargest(50, 'PMID_Count')
 
     # --- 步骤 3: 统计每位作者的热点方向 ---
     print("正在分析作者研究热点...")
     results = []
 
-    for _, author_row in top_50_authors.iterrows():
-        author_name = author_row['Author']
-        pmid_list_str = author_row['PMID']
+    for author_name, author_id, pmid_list_str, pmid_count, main_affiliation, country in \
+            top_50_authors[AUTHOR_COLUMNS].itertuples(index=False, name=None):
         pmid_list = parse_list_string(pmid_list_str)
         
-        all_keywords = []
+        keyword_counter = Counter()
         for pmid in pmid_list:
-            pmid_str = str(pmid)
-            if pmid_str in pmid_to_keywords:
-                all_keywords.extend(pmid_to_keywords[pmid_str])
+            keyword_counter.update(pmid_to_keywords.get(str(pmid), ()))
         
-        if all_keywords:
-            top_5_keywords = Counter(all_keywords).most_common(5)
+        if keyword_counter:
+            top_5_keywords = keyword_counter.most_common(5)
             hotspots_str = "; ".join([f"{k} ({v})" for k, v in top_5_keywords])
         else:
             hotspots_str = "无有效关键词数据"
 
         results.append({
             'Author': author_name,
-            'AuthorID': author_row['AuthorID'],
-            'Total_Papers': author_row['PMID_Count'],
-            'Main_Affiliation': author_row.get('MainAffiliation', 'N/A'),
-            'Country': author_row.get('Country', 'N/A'),
+            'AuthorID': author_id,
+            'Total_Papers': pmid_count,
+            'Main_Affiliation': main_affiliation,
+            'Country': country,
             'Top_5_Research_Hotspots': hotspots_str
         })
 
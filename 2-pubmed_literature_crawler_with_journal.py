@@ -1,20 +1,31 @@
+import asyncio
+import aiohttp
+import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import csv
 import time
 import urllib.parse
 import re
 import random
-import calendar
 from datetime import datetime, timedelta
 from urllib.parse import urlparse, parse_qs, urlunparse, urlencode
 import math
+from collections import deque
 import os
-import glob
 
 
+try:
+    import brotli  # noqa: F401  安装后requests/aiohttp可自动解压br响应
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
 headers = {
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36'
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
+    'Accept-Encoding': ACCEPT_ENCODING,
+    'Connection': 'keep-alive'
 }
 
 # -------------------------- 用户可在此处设置起始和终止日期 --------------------------
@@ -23,24 +34,50 @@ START_DATE = "2015/01/01"
 
 # 终止日期 (格式: YYYY/MM/DD 或 "Today" 表示今天)
 END_DATE = "2025/08/26"  # 可改为具体日期如 "2024/06/30"
+
+# 检索结果页面的最大并发请求数
+MAX_CONCURRENT_PAGES = 8
+
+# 同步请求复用的全局会话（连接池保持长连接）
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0))
+
+# CSV输出文件的写缓冲区大小
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# 预编译的正则表达式
+VERSION_DATE_PATTERN = re.compile(r'ver\.(\d{8})\.csv')
+EIGHT_DIGITS_PATTERN = re.compile(r'(\d{8})')
+TITLE_PUNCT_PATTERN = re.compile(r'\s+([.,;])')
+JOURNAL_PATTERN = re.compile(r'^([^.;]+)')
+DATE_MONTH_ABBR_PATTERN = re.compile(r'(\d{4}\s+[A-Z][a-z]{2})')
+DATE_MONTH_NUM_PATTERN = re.compile(r'(\d{4}\s+\d{1,2})')
+YEAR_PATTERN = re.compile(r'\b(19|20)\d{2}\b')
+# 固定英文月份缩写（下标与月份对应），与PubMed格式一致且不受系统locale影响
+MONTH_ABBR = ('', 'Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
 # ----------------------------------------------------------------------------------
 
 
 def get_latest_version_file():
     """查找最新版本的CSV文件并正确提取日期"""
-    pattern = './output/pubmed_results_ver.*.csv'
-    files = glob.glob(pattern)
+    output_dir = './output'
+    try:
+        with os.scandir(output_dir) as entries:
+            files = [os.path.join(output_dir, entry.name) for entry in entries
+                     if entry.is_file()
+                     and entry.name.startswith('pubmed_results_ver.')
+                     and entry.name.endswith('.csv')]
+    except FileNotFoundError:
+        files = []
 
     if not files:
         print("未找到历史版本文件")
         return None, None
 
-    # 按文件名中的日期排序
-    files.sort(key=lambda x: extract_date_from_filename(x), reverse=True)
-    latest_file = files[0]
-
-    # 从文件名中提取版本日期
-    version_date = extract_date_from_filename(latest_file)
+    # 按文件名中的日期排序（每个文件只提取一次日期）
+    dated_files = [(extract_date_from_filename(file_path), file_path) for file_path in files]
+    dated_files.sort(key=lambda item: item[0], reverse=True)
+    version_date, latest_file = dated_files[0]
     return latest_file, version_date
 
 
@@ -49,12 +86,12 @@ def extract_date_from_filename(file_path):
     filename = os.path.basename(file_path)
 
     # 使用正则表达式匹配日期部分
-    date_match = re.search(r'ver\.(\d{8})\.csv', filename)
+    date_match = VERSION_DATE_PATTERN.search(filename)
     if date_match:
         return date_match.group(1)
 
     # 备用方法：尝试匹配8位数字
-    date_match = re.search(r'(\d{8})', filename)
+    date_match = EIGHT_DIGITS_PATTERN.search(filename)
     if date_match:
         return date_match.group(1)
 
@@ -64,19 +101,38 @@ def extract_date_from_filename(file_path):
 
 
 def load_existing_data(file_path):
-    """加载现有数据并返回PMID集合和文献列表"""
+    """加载现有数据，返回PMID集合、表头和按位置存储的文献行（不为每行构建字典）"""
     existing_pmids = set()
-    existing_articles = []
+    existing_rows = []
     if not os.path.exists(file_path):
-        return existing_pmids, existing_articles
-
-    with open(file_path, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
+        return existing_pmids, [], existing_rows
+
+    with open(file_path, 'r', encoding='utf-8-sig', newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        if 'PMID' not in header:
+            return existing_pmids, header, existing_rows
+        pmid_idx = header.index('PMID')
         for row in reader:
-            if 'PMID' in row and row['PMID']:
-                existing_pmids.add(row['PMID'])
-                existing_articles.append(row)
-    return existing_pmids, existing_articles
+            if len(row) > pmid_idx and row[pmid_idx]:
+                existing_pmids.add(row[pmid_idx])
+                existing_rows.append(row)
+    return existing_pmids, header, existing_rows
+
+
+def rows_to_articles(header, rows):
+    """将按位置存储的文献行转换为字典列表（仅在需要逐条合并时调用）"""
+    return [dict(zip(header, row)) for row in rows]
+
+
+def header_charset(response_headers):
+    """从响应头的 Content-Type 中读取字符集，未声明时返回 None（交由解析器自行识别）"""
+    content_type = response_headers.get('content-type', '').lower()
+    for part in content_type.split(';'):
+        part = part.strip()
+        if part.startswith('charset='):
+            return part[8:].strip()
+    return None
 
 
 def get_total_results(search_url):
@@ -88,13 +144,13 @@ def get_total_results(search_url):
             headers[
                 'User-Agent'] = f'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{random.randint(90, 120)}.0.0.0 Safari/537.36'
 
-            response = requests.get(f"{search_url}&page=1", headers=headers, timeout=15)
+            response = SESSION.get(f"{search_url}&page=1", headers=headers, timeout=15)
             response.raise_for_status()
 
-            if "CAPTCHA" in response.text:
+            if b"CAPTCHA" in response.content:
                 raise RuntimeError("触发反爬验证码")
 
-            soup = BeautifulSoup(response.text, 'html.parser')
+            soup = BeautifulSoup(response.content, 'lxml', from_encoding=header_charset(response.headers))
 
             # 获取总文献数
             results_info = soup.find('span', class_='value')
@@ -105,10 +161,11 @@ def get_total_results(search_url):
                 raise ValueError("结果统计元素未找到")
 
             total_text = results_info.get_text(strip=True).replace(',', '')
-            if total_text.isdigit():
-                return int(total_text)
-            else:
+            # 非数字时int()抛出ValueError；再单独排除负数
+            total = int(total_text)
+            if total < 0:
                 raise ValueError(f"无效的结果数: {total_text}")
+            return total
 
         except Exception as e:
             print(f"获取总结果数失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
@@ -120,113 +177,137 @@ def get_total_results(search_url):
     raise RuntimeError("无法获取总结果数")
 
 
-def parse_page(page_url):
-    """带重试机制的页面解析，提取期刊信息"""
-    max_retries = 2
-    backoff_factor = 3
+def parse_page(page_html, encoding=None):
+    """解析检索结果页面HTML（原始字节），提取文献及期刊信息"""
+    soup = BeautifulSoup(page_html, 'lxml', from_encoding=encoding)
+    articles = []
 
-    for attempt in range(max_retries):
+    for entry in soup.select('article.full-docsum'):
         try:
-            # 动态User-Agent
-            headers[
-                'User-Agent'] = f'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{random.randint(90, 120)}.0.0.0 Safari/537.36'
+            # 标题处理
+            title_tag = entry.select_one('a.docsum-title')
+            raw_title = ' '.join(title_tag.stripped_strings)
+            title = TITLE_PUNCT_PATTERN.sub(r'\1', raw_title).strip()
+
+            # 作者处理
+            authors_tag = entry.select_one('span.docsum-authors')
+            authors = ' '.join(authors_tag.stripped_strings).strip() if authors_tag else ""
+
+            # PMID提取
+            pmid_span = entry.select_one('span.docsum-pmid')
+            if pmid_span:
+                pmid = pmid_span.get_text(strip=True)
+            else:
+                pmid_link = title_tag['href']
+                pmid = urllib.parse.urlparse(pmid_link).path.split('/')[-1]
+                print(f"警告：未找到docsum-pmid元素，从URL提取PMID: {pmid}")
+
+            # 提取期刊、日期信息
+            date_span = entry.select_one('span.docsum-journal-citation')
+            date_text = ""
+            journal_text = ""
+            
+            if date_span:
+                citation_text = date_span.get_text(strip=True)
+                
+                # 提取期刊信息
+                journal_match = JOURNAL_PATTERN.search(citation_text)
+                if journal_match:
+                    journal_text = journal_match.group(1).strip()
+                
+                # 提取日期信息
+                date_match = DATE_MONTH_ABBR_PATTERN.search(citation_text)
+                if date_match:
+                    date_text = date_match.group(1)
+                else:
+                    date_match = DATE_MONTH_NUM_PATTERN.search(citation_text)
+                    if date_match:
+                        year, month_num = date_match.group(1).split()
+                        try:
+                            month_name = MONTH_ABBR[int(month_num)]
+                            date_text = f"{year} {month_name}"
+                        except (ValueError, IndexError):
+                            date_text = f"{year} {month_num}"
+                    else:
+                        year_match = YEAR_PATTERN.search(citation_text)
+                        if year_match:
+                            date_text = year_match.group(0)
+
+            articles.append({
+                'Title': title,
+                'Authors': authors,
+                'PMID': pmid,
+                'Journal': journal_text,
+                'Date': date_text
+            })
+        except Exception as e:
+            print(f"解析条目失败: {str(e)}")
+            continue
 
-            response = requests.get(page_url, headers=headers, timeout=15)
-            response.raise_for_status()
+    return articles
 
-            if "CAPTCHA" in response.text:
-                raise RuntimeError("触发反爬验证码")
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-            articles = []
+async def fetch_page(session, semaphore, page_url):
+    """带重试机制的异步页面请求与解析，并发数由semaphore限制"""
+    max_retries = 2
+    backoff_factor = 3
 
-            for entry in soup.find_all('article', class_='full-docsum'):
-                try:
-                    # 标题处理
-                    title_tag = entry.find('a', class_='docsum-title')
-                    raw_title = ' '.join(title_tag.stripped_strings)
-                    title = re.sub(r'\s+([.,;])', r'\1', raw_title).strip()
+    async with semaphore:
+        for attempt in range(max_retries):
+            try:
+                # 动态User-Agent
+                request_headers = dict(headers)
+                request_headers[
+                    'User-Agent'] = f'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/{random.randint(90, 120)}.0.0.0 Safari/537.36'
 
-                    # 作者处理
-                    authors_tag = entry.find('span', class_='docsum-authors')
-                    authors = ' '.join(authors_tag.stripped_strings).strip() if authors_tag else ""
+                async with session.get(page_url, headers=request_headers) as response:
+                    response.raise_for_status()
+                    page_html = await response.read()
+                    encoding = response.charset
 
-                    # PMID提取
-                    pmid_span = entry.find('span', class_='docsum-pmid')
-                    if pmid_span:
-                        pmid = pmid_span.get_text(strip=True)
-                    else:
-                        pmid_link = entry.find('a', class_='docsum-title')['href']
-                        pmid = urllib.parse.urlparse(pmid_link).path.split('/')[-1]
-                        print(f"警告：未找到docsum-pmid元素，从URL提取PMID: {pmid}")
-
-                    # 提取期刊、日期信息
-                    date_span = entry.find('span', class_='docsum-journal-citation')
-                    date_text = ""
-                    journal_text = ""
-                    
-                    if date_span:
-                        citation_text = date_span.get_text(strip=True)
-                        
-                        # 提取期刊信息
-                        journal_match = re.search(r'^([^.;]+)', citation_text)
-                        if journal_match:
-                            journal_text = journal_match.group(1).strip()
-                        
-                        # 提取日期信息
-                        date_match = re.search(r'(\d{4}\s+[A-Z][a-z]{2})', citation_text)
-                        if date_match:
-                            date_text = date_match.group(1)
-                        else:
-                            date_match = re.search(r'(\d{4}\s+\d{1,2})', citation_text)
-                            if date_match:
-                                year, month_num = date_match.group(1).split()
-                                try:
-                                    month_name = calendar.month_abbr[int(month_num)]
-                                    date_text = f"{year} {month_name}"
-                                except (ValueError, IndexError):
-                                    date_text = f"{year} {month_num}"
-                            else:
-                                year_match = re.search(r'\b(19|20)\d{2}\b', citation_text)
-                                if year_match:
-                                    date_text = year_match.group(0)
-
-                    articles.append({
-                        'Title': title,
-                        'Authors': authors,
-                        'PMID': pmid,
-                        'Journal': journal_text,
-                        'Date': date_text
-                    })
-                except Exception as e:
-                    print(f"解析条目失败: {str(e)}")
-                    continue
-
-            return articles
+                if b"CAPTCHA" in page_html:
+                    raise RuntimeError("触发反爬验证码")
 
-        except Exception as e:
-            print(f"页面请求失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
-            if attempt < max_retries - 1:
-                sleep_time = backoff_factor ** (attempt + 1) + random.uniform(0, 1)
-                print(f"等待 {sleep_time:.1f} 秒后重试...")
-                time.sleep(sleep_time)
+                articles = parse_page(page_html, encoding)
+
+                # 动态延迟（占用并发名额，控制对PubMed的请求频率）
+                await asyncio.sleep(2 + random.random() * 1)
+                return articles
+
+            except Exception as e:
+                print(f"页面请求失败 (尝试 {attempt + 1}/{max_retries}): {str(e)}")
+                if attempt < max_retries - 1:
+                    sleep_time = backoff_factor ** (attempt + 1) + random.uniform(0, 1)
+                    print(f"等待 {sleep_time:.1f} 秒后重试...")
+                    await asyncio.sleep(sleep_time)
 
     print(f"无法获取页面: {page_url}")
     return []
 
 
+async def fetch_pages(page_urls):
+    """并发获取多个检索结果页面，按页码顺序返回每页的文献列表"""
+    semaphore = asyncio.Semaphore(MAX_CONCURRENT_PAGES)
+    connector = aiohttp.TCPConnector(limit_per_host=MAX_CONCURRENT_PAGES)
+    timeout = aiohttp.ClientTimeout(total=15)
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        tasks = [fetch_page(session, semaphore, page_url) for page_url in page_urls]
+        return await asyncio.gather(*tasks)
+
+
 def crawl_time_interval(search_url, total_results, existing_pmids):
     """爬取指定时间段内的所有文献，过滤已存在的PMID"""
     articles = []
     total_pages = math.ceil(total_results / 200)
     actual_pages = min(total_pages, 50)
 
-    print(f"总文献数: {total_results} | 预计爬取 {actual_pages} 页")
+    print(f"总文献数: {total_results} | 预计爬取 {actual_pages} 页（并发 {MAX_CONCURRENT_PAGES}）")
 
-    for page in range(1, actual_pages + 1):
-        page_url = f"{search_url}&page={page}"
-        print(f"爬取页面 {page}/{actual_pages}")
-        page_articles = parse_page(page_url)
+    page_urls = [f"{search_url}&page={page}" for page in range(1, actual_pages + 1)]
+    pages_articles = asyncio.run(fetch_pages(page_urls))
+
+    for page, page_articles in enumerate(pages_articles, 1):
+        print(f"页面 {page}/{actual_pages}")
 
         if page_articles:
             # 过滤已存在的PMID
@@ -244,11 +325,6 @@ def crawl_time_interval(search_url, total_results, existing_pmids):
         else:
             print("未获取到文献，可能遇到反爬措施")
 
-        # 动态延迟
-        delay = 2 + random.random() * 1
-        print(f"等待 {delay:.1f} 秒后继续...")
-        time.sleep(delay)
-
     pmid_count = sum(1 for article in articles if article['PMID'])
     print(f"成功提取PMID的新文献: {pmid_count}/{len(articles)} ({pmid_count / len(articles) * 100:.1f}%)")
 
@@ -297,116 +373,99 @@ def get_mid_date(start_date, end_date):
     return format_date(mid_date)
 
 
-def process_time_interval(base_url, start_date, end_date, all_articles, existing_pmids, depth=0):
-    """递归处理时间段"""
-    indent = "  " * depth
-    print(f"{indent}处理时间段 [{start_date} 至 {end_date}] (深度 {depth})")
+def process_time_interval(base_url, start_date, end_date, all_articles, existing_pmids):
+    """迭代处理时间段：结果超过10,000条的时间段对半分割后重新入栈（深度优先，保持原有时间顺序）"""
+    pending_intervals = deque([(start_date, end_date, 0)])
 
-    # URL编码日期
-    start_encoded = urllib.parse.quote(start_date, safe='')
-    end_encoded = urllib.parse.quote(end_date, safe='')
+    while pending_intervals:
+        interval_start, interval_end, depth = pending_intervals.pop()
+        indent = "  " * depth
+        print(f"{indent}处理时间段 [{interval_start} 至 {interval_end}] (深度 {depth})")
 
-    # 构建带时间过滤器的URL
-    time_filter = f"&filter=dates.{start_encoded}-{end_encoded}"
-    search_url = base_url + time_filter
-
-    try:
-        # 获取该时间段的总结果数
-        total_results = get_total_results(search_url)
-        print(f"{indent}时间段内找到 {total_results} 篇文献")
+        # URL编码日期
+        start_encoded = urllib.parse.quote(interval_start, safe='')
+        end_encoded = urllib.parse.quote(interval_end, safe='')
 
-        if total_results == 0:
-            print(f"{indent}跳过无结果的时间段")
-            return
+        # 构建带时间过滤器的URL
+        time_filter = f"&filter=dates.{start_encoded}-{end_encoded}"
+        search_url = base_url + time_filter
 
-        # 如果不超过10,000篇，直接爬取
-        if total_results <= 10000:
-            articles = crawl_time_interval(search_url, total_results, existing_pmids)
-            if articles:
-                all_articles.extend(articles)
-                print(f"{indent}成功爬取 {len(articles)} 篇新文献")
-            return
-
-        # 如果超过10,000篇，分割时间段
-        print(f"{indent}结果超过10,000条 ({total_results})，分割时间段...")
-
-        # 计算中间日期
-        mid_date = get_mid_date(start_date, end_date)
+        try:
+            # 获取该时间段的总结果数
+            total_results = get_total_results(search_url)
+            print(f"{indent}时间段内找到 {total_results} 篇文献")
 
-        # 递归处理前半段
-        process_time_interval(base_url, start_date, mid_date, all_articles, existing_pmids, depth + 1)
+            if total_results == 0:
+                print(f"{indent}跳过无结果的时间段")
+                continue
 
-        # 递归处理后半段
-        next_day = (datetime.strptime(mid_date, "%Y/%m/%d") + timedelta(days=1)).strftime("%Y/%m/%d")
-        process_time_interval(base_url, next_day, end_date, all_articles, existing_pmids, depth + 1)
+            # 如果不超过10,000篇，直接爬取
+            if total_results <= 10000:
+                articles = crawl_time_interval(search_url, total_results, existing_pmids)
+                if articles:
+                    all_articles.extend(articles)
+                    print(f"{indent}成功爬取 {len(articles)} 篇新文献")
+                continue
 
-    except Exception as e:
-        print(f"{indent}处理时间段失败: {str(e)}")
+            # 如果超过10,000篇，分割时间段
+            print(f"{indent}结果超过10,000条 ({total_results})，分割时间段...")
 
-    # 时间段之间的延迟
-    delay = 2 + random.random() * 1
-    print(f"{indent}等待 {delay:.1f} 秒后继续...")
-    time.sleep(delay)
+            # 计算中间日期
+            mid_date = get_mid_date(interval_start, interval_end)
+            next_day = (datetime.strptime(mid_date, "%Y/%m/%d") + timedelta(days=1)).strftime("%Y/%m/%d")
 
+            # 后半段先入栈，保证前半段先被处理
+            pending_intervals.append((next_day, interval_end, depth + 1))
+            pending_intervals.append((interval_start, mid_date, depth + 1))
 
-def remove_duplicate_pmids(csv_file):
-    """读取CSV文件，删除重复PMID的行"""
-    unique_articles = []
-    seen_pmids = set()
-    duplicate_count = 0
+        except Exception as e:
+            print(f"{indent}处理时间段失败: {str(e)}")
 
-    # 读取文件内容
-    with open(csv_file, 'r', encoding='utf-8-sig') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            pmid = row['PMID']
+        # 时间段之间的延迟
+        delay = 2 + random.random() * 1
+        print(f"{indent}等待 {delay:.1f} 秒后继续...")
+        time.sleep(delay)
 
-            # 检查PMID是否为空或已存在
-            if not pmid or pmid in seen_pmids:
-                duplicate_count += 1
-                if pmid:
-                    print(f"发现重复PMID: {pmid}，标题: {row['Title']}")
-                else:
-                    print(f"发现空PMID的条目，标题: {row['Title']}")
-                continue
 
-            seen_pmids.add(pmid)
-            unique_articles.append(row)
+def remove_duplicate_pmids(articles_df):
+    """删除重复PMID及空PMID的行，返回去重后的DataFrame"""
+    pmids = articles_df['PMID'].fillna('').astype(str)
+    empty_mask = pmids == ''
+    drop_mask = empty_mask | pmids.duplicated(keep='first')
+    duplicate_count = int(drop_mask.sum())
 
     if duplicate_count == 0:
         print("未发现重复PMID的条目")
-        return
+        return articles_df
 
-    # 重新写入文件（覆盖原文件）
-    with open(csv_file, 'w', newline='', encoding='utf-8-sig') as f:
-        writer = csv.DictWriter(f, fieldnames=reader.fieldnames)
-        writer.writeheader()
-        writer.writerows(unique_articles)
+    for pmid, title, is_empty in zip(pmids[drop_mask], articles_df.loc[drop_mask, 'Title'], empty_mask[drop_mask]):
+        if is_empty:
+            print(f"发现空PMID的条目，标题: {title}")
+        else:
+            print(f"发现重复PMID: {pmid}，标题: {title}")
 
-    print(f"已删除 {duplicate_count} 个重复条目，保留 {len(unique_articles)} 个唯一条目")
+    unique_df = articles_df[~drop_mask]
+    print(f"已删除 {duplicate_count} 个重复条目，保留 {len(unique_df)} 个唯一条目")
+    return unique_df
 
 
 def merge_new_articles(existing_articles, new_articles):
-    """合并新旧文献数据，保留所有字段"""
+    """合并新旧文献数据，保留所有字段，返回 PMID -> 文献 的字典（按首次出现顺序）"""
     # 创建PMID到文献的映射
     pmid_to_article = {article['PMID']: article for article in existing_articles}
 
     # 更新或添加新文献
     for new_article in new_articles:
         pmid = new_article['PMID']
-        if pmid in pmid_to_article:
-            # 如果已有该PMID的文献，合并字段
-            existing = pmid_to_article[pmid]
-            # 保留新数据中的期刊信息（如果存在）
-            if 'Journal' in new_article and new_article['Journal']:
-                existing['Journal'] = new_article['Journal']
-            existing.update(new_article)  # 用新数据更新旧数据
+        existing = pmid_to_article.get(pmid)
+        if existing is not None:
+            # 如果已有该PMID的文献，用新数据更新旧数据（保留旧数据中的其他字段）
+            existing.update(new_article)
         else:
             # 否则添加新文献
             pmid_to_article[pmid] = new_article
 
-    # 返回合并后的文献列表
-    return list(pmid_to_article.values())
+    return pmid_to_article
 
 
 def validate_date(date_str, is_end_date=False, start_date=None):
@@ -460,8 +519,8 @@ def main():
     # 查找最新版本文件
     latest_file, version_date = get_latest_version_file()
     existing_pmids = set()
-    existing_articles = []
-    all_articles = []
+    existing_header = []
+    existing_rows = []
 
     # 处理历史爬取日期
     last_crawl_date = None
@@ -475,8 +534,8 @@ def main():
             last_crawl_date = None
 
         # 加载现有PMID和文献数据
-        existing_pmids, existing_articles = load_existing_data(latest_file)
-        print(f"加载 {len(existing_pmids)} 个现有PMID, {len(existing_articles)} 篇现有文献")
+        existing_pmids, existing_header, existing_rows = load_existing_data(latest_file)
+        print(f"加载 {len(existing_pmids)} 个现有PMID, {len(existing_rows)} 篇现有文献")
 
     # 确定实际爬取的起始日期
     if last_crawl_date and last_crawl_date >= validated_start_date:
@@ -492,46 +551,43 @@ def main():
             print(f"将进行完整爬取: {actual_start_date} 至 {validated_end_date}")
 
     # 确保爬取的起始日期不晚于终止日期
+    new_articles = []
     if actual_start_date <= validated_end_date:
         # 爬取文献
-        new_articles = []
         process_time_interval(base_url, actual_start_date, validated_end_date, new_articles, existing_pmids)
-
         if new_articles:
             print(f"获取到 {len(new_articles)} 篇新文献")
-            # 合并新旧文献数据
-            all_articles = merge_new_articles(existing_articles, new_articles)
         else:
             print("没有发现新文献")
-            all_articles = existing_articles
     else:
         print(f"无需爬取新文献（起始日期 {actual_start_date} 已晚于终止日期 {validated_end_date}）")
-        all_articles = existing_articles
+
+    # 确保基础字段在前面，包含Journal字段
+    # parse_page 产生的文献字段固定为基础字段，额外字段只可能来自历史文件表头，无需逐条扫描
+    base_fields = ['Title', 'Authors', 'PMID', 'Journal', 'Date']
+    fieldnames = base_fields + [field for field in existing_header if field not in base_fields]
+
+    if new_articles:
+        # 合并新旧文献数据
+        merged_articles = merge_new_articles(rows_to_articles(existing_header, existing_rows), new_articles)
+        articles_df = pd.DataFrame.from_records(list(merged_articles.values()), columns=fieldnames)
+    else:
+        # 无新文献时直接由按位置存储的行构建DataFrame
+        articles_df = pd.DataFrame(existing_rows, columns=existing_header).reindex(columns=fieldnames)
 
     # 生成新版本文件名
     new_filename = f"./output/pubmed_results_ver.{today_str}.csv"
 
     # 保存结果
-    if all_articles:
-        # 确定所有可能的字段名，确保Journal字段存在
-        all_fields = set()
-        for article in all_articles:
-            all_fields.update(article.keys())
-
-        # 确保基础字段在前面，包含Journal字段
-        base_fields = ['Title', 'Authors', 'PMID', 'Journal', 'Date']
-        fieldnames = base_fields + [field for field in all_fields if field not in base_fields]
-
-        # 保存CSV
-        with open(new_filename, 'w', newline='', encoding='utf-8-sig') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(all_articles)
-
-        # 去重
-        print(f"完成！共保存 {len(all_articles)} 篇文献到 {new_filename}")
+    if not articles_df.empty:
+        # 在内存中去重后一次性写入CSV（无需写入后再读回重写）
         print("开始检查并删除重复PMID的条目...")
-        remove_duplicate_pmids(new_filename)
+        articles_df = remove_duplicate_pmids(articles_df)
+
+        # 使用1MB写缓冲区，减少系统调用次数
+        with open(new_filename, 'w', newline='', encoding='utf-8-sig', buffering=WRITE_BUFFER_SIZE) as f:
+            articles_df.to_csv(f, columns=fieldnames, index=False, lineterminator='\r\n')
+        print(f"完成！共保存 {len(articles_df)} 篇文献到 {new_filename}")
     else:
         print("没有文献数据可保存")
 
@@ -10,12 +10,14 @@ import os
 import argparse
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup, UnicodeDammit
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
 from datetime import datetime
 import re
 import glob
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import ast
+from request_utils import RateLimiter  # 公共的线程安全限速器
 
 # --- 配置区 ---
 OUTPUT_DIR = 'output'
@@ -23,48 +25,62 @@ BASE_URL = 'https://pubmed.ncbi.nlm.nih.gov/'
 TODAY_STR = datetime.now().strftime('%Y%m%d')
 TEST_MODE_LIMIT = 30
 
+# 安装brotli后额外接受br压缩，进一步减少传输字节
+try:
+    import brotli  # noqa: F401
+    ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    ACCEPT_ENCODING = 'gzip, deflate'
+
+# 复用TCP/TLS连接的全局会话，避免每个PMID重新握手
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=0))
+SESSION.headers.update({'Accept-Encoding': ACCEPT_ENCODING, 'Connection': 'keep-alive'})
+
+# 并发爬取配置：线程数与所有线程合计的每秒请求数上限
+MAX_WORKERS = 8
+REQUESTS_PER_SECOND = 3
+
+# 从文件名中提取8位日期
+FILE_DATE_PATTERN = re.compile(r'(\d{8})')
+
 # --- 核心功能函数 ---
 
-def parse_pubmed_date(date_str):
-    if pd.isna(date_str):
-        return None
-    date_str = str(date_str).strip()
-    try:
-        return datetime.strptime(date_str, '%Y %b')
-    except ValueError:
-        try:
-            return datetime.strptime(date_str, '%Y')
-        except ValueError:
-            return None
+RATE_LIMITER = RateLimiter(REQUESTS_PER_SECOND)
+
+def parse_pubmed_dates(date_series):
+    """向量化解析PubMed日期列（'YYYY Mon' 或 'YYYY'），无法解析的记为 NaT"""
+    dates = date_series.astype('string').str.strip()
+    month_dates = pd.to_datetime(dates, format='%Y %b', errors='coerce')
+    year_dates = pd.to_datetime(dates, format='%Y', errors='coerce')
+    return month_dates.fillna(year_dates)
 
-def detect_encoding(content, headers=None):
+def detect_encoding(headers=None):
+    """从响应头的 Content-Type 中读取字符集，未声明时返回 None（交由解析器自行识别）"""
     if headers and 'content-type' in headers:
         content_type = headers['content-type'].lower()
         for part in content_type.split(';'):
             part = part.strip()
             if part.startswith('charset='):
                 return part[8:].strip()
-    
-    dammit = UnicodeDammit(content)
-    return dammit.original_encoding
+    return None
 
 def scrape_pmid_details(pmid):
     url = f"{BASE_URL}{pmid}/"
     try:
-        response = requests.get(url, timeout=20)
+        RATE_LIMITER.wait()
+        response = SESSION.get(url, timeout=20)
         response.raise_for_status()
         
-        encoding = detect_encoding(response.content, response.headers)
-        if encoding:
-            response.encoding = encoding
-            
-        html_content = response.text
+        # 直接将原始字节交给解析器，避免先解码为str再由解析器重新编码
+        encoding = detect_encoding(response.headers)
+        html_content = response.content
         
     except requests.RequestException as e:
         print(f"  -! 无法访问 PMID {pmid} 页面: {e}")
         return None
 
-    soup = BeautifulSoup(html_content, 'html.parser')
+    soup = BeautifulSoup(html_content, 'lxml', from_encoding=encoding)
 
     abstract_div = soup.find('div', {'id': 'eng-abstract'})
     abstract_text = ''
@@ -129,7 +145,8 @@ def main(test_mode=False, specific_pmids=None):
         return
     latest_pubmed_file = max(pubmed_results_files, key=os.path.getctime)
     print(f"-> 读取主数据文件: {latest_pubmed_file}")
-    df_pubmed = pd.read_csv(latest_pubmed_file)
+    # PMID统一按字符串读取，与命令行传入的PMID类型一致
+    df_pubmed = pd.read_csv(latest_pubmed_file, dtype={'PMID': str})
 
     target_pmids = []
     existing_author_df = None
@@ -140,7 +157,7 @@ def main(test_mode=False, specific_pmids=None):
 
     if latest_author_file:
         print(f"-> 发现已存在的作者信息文件: {os.path.basename(latest_author_file)}")
-        file_date_match = re.search(r'(\d{8})', os.path.basename(latest_author_file))
+        file_date_match = FILE_DATE_PATTERN.search(os.path.basename(latest_author_file))
         
         if file_date_match.group(1) == TODAY_STR:
             print("== 今日的作者信息文件已存在。脚本将不会重复执行。")
@@ -166,8 +183,9 @@ def main(test_mode=False, specific_pmids=None):
         # 使用指定的PMID列表
         print(f"-> 将爬取 {len(specific_pmids)} 个指定的PMID")
         # 过滤掉不在主文件中的PMID
-        valid_pmids = [pmid for pmid in specific_pmids if pmid in df_pubmed['PMID'].values]
-        invalid_pmids = [pmid for pmid in specific_pmids if pmid not in df_pubmed['PMID'].values]
+        pmid_set = set(df_pubmed['PMID'])
+        valid_pmids = [pmid for pmid in specific_pmids if pmid in pmid_set]
+        invalid_pmids = [pmid for pmid in specific_pmids if pmid not in pmid_set]
         
         if invalid_pmids:
             print(f"  -! 警告: 以下PMID不在主文件中: {invalid_pmids}")
@@ -176,7 +194,7 @@ def main(test_mode=False, specific_pmids=None):
             print("  -! 错误: 指定的PMID中没有有效的PMID")
             return
             
-        df_to_scrape = df_pubmed[df_pubmed['PMID'].isin(valid_pmids)].copy()
+        df_to_scrape = df_pubmed[df_pubmed['PMID'].isin(set(valid_pmids))].copy()
         
         # 即使指定了PMID，也只处理那些没有摘要的记录（除非强制覆盖）
         if 'Abstract' in df_pubmed.columns:
@@ -190,7 +208,7 @@ def main(test_mode=False, specific_pmids=None):
             
     else:
         # 常规模式：根据日期筛选
-        df_pubmed['parsed_date'] = df_pubmed['Date'].apply(parse_pubmed_date)
+        df_pubmed['parsed_date'] = parse_pubmed_dates(df_pubmed['Date'])
         df_to_scrape = df_pubmed[df_pubmed['parsed_date'] >= start_date_for_filter].copy()
         
         if 'Abstract' in df_pubmed.columns:
@@ -217,19 +235,22 @@ def main(test_mode=False, specific_pmids=None):
     new_keywords = {}
     all_new_author_entries = []
 
-    for i, pmid in enumerate(target_pmids):
-        print(f"[{i+1}/{len(target_pmids)}] 正在爬取 PMID: {pmid}")
-        details = scrape_pmid_details(pmid)
-        if details:
-            new_abstracts[pmid] = details['abstract']
-            new_keywords[pmid] = details['keywords']
-            for author in details['authors']:
-                all_new_author_entries.append({
-                    'Author': author['name'],
-                    'Affiliation': author['affiliation'],
-                    'PMID': str(pmid)
-                })
-        time.sleep(0.5)
+    # 多线程并发爬取，共享SESSION连接池，由RATE_LIMITER统一限速
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        future_to_pmid = {executor.submit(scrape_pmid_details, pmid): pmid for pmid in target_pmids}
+        for i, future in enumerate(as_completed(future_to_pmid)):
+            pmid = future_to_pmid[future]
+            print(f"[{i+1}/{len(target_pmids)}] 已爬取 PMID: {pmid}")
+            details = future.result()
+            if details:
+                new_abstracts[pmid] = details['abstract']
+                new_keywords[pmid] = details['keywords']
+                for author in details['authors']:
+                    all_new_author_entries.append({
+                        'Author': author['name'],
+                        'Affiliation': author['affiliation'],
+                        'PMID': str(pmid)
+                    })
 
     print("\n--- 爬取完成，开始处理和保存数据 ---")
 
@@ -239,10 +260,8 @@ def main(test_mode=False, specific_pmids=None):
     if 'Keywords' not in df_pubmed.columns:
         df_pubmed['Keywords'] = pd.NA
 
-    df_pubmed.set_index('PMID', inplace=True)
-    df_pubmed['Abstract'].update(pd.Series(new_abstracts))
-    df_pubmed['Keywords'].update(pd.Series(new_keywords))
-    df_pubmed.reset_index(inplace=True)
+    df_pubmed['Abstract'] = df_pubmed['PMID'].map(new_abstracts).fillna(df_pubmed['Abstract'])
+    df_pubmed['Keywords'] = df_pubmed['PMID'].map(new_keywords).fillna(df_pubmed['Keywords'])
     
     if 'parsed_date' in df_pubmed.columns:
         df_pubmed.drop(columns=['parsed_date'], inplace=True)
@@ -260,17 +279,21 @@ def main(test_mode=False, specific_pmids=None):
     if existing_author_df is not None:
         if not (isinstance(existing_author_df['PMID'].iloc[0], list)):
             print("  -! 警告: 旧作者文件中的PMID列不是列表格式，聚合功能可能受限。")
-            existing_author_df['PMID'] = existing_author_df['PMID'].apply(lambda x: [x] if not isinstance(x, list) else x)
 
-        new_author_df['PMID'] = new_author_df['PMID'].apply(lambda x: [x])
-        combined_df = pd.concat([existing_author_df, new_author_df], ignore_index=True)
+        # 将旧文件中的PMID列表展开为每行一个PMID，与新数据统一为字符串
+        existing_pmid_rows = existing_author_df[['Author', 'Affiliation', 'PMID']].explode('PMID').dropna(subset=['PMID'])
+        existing_pmid_rows['PMID'] = existing_pmid_rows['PMID'].astype(str)
+        combined_df = pd.concat([existing_pmid_rows, new_author_df], ignore_index=True)
     else:
         combined_df = new_author_df
-        combined_df['PMID'] = combined_df['PMID'].apply(lambda x: [x])
 
-    aggregated_authors = combined_df.groupby(['Author', 'Affiliation'])['PMID'].sum().reset_index()
+    # 按作者+单位聚合为去重排序后的PMID列表（避免逐组拼接列表）
+    aggregated_authors = (
+        combined_df.groupby(['Author', 'Affiliation'])['PMID']
+        .apply(lambda pmids: sorted(set(pmids)))
+        .reset_index()
+    )
 
-    aggregated_authors['PMID'] = aggregated_authors['PMID'].apply(lambda pmid_list: sorted(list(set(pmid_list))))
     aggregated_authors['PMID_Count'] = aggregated_authors['PMID'].apply(len)
     
     aggregated_authors['PMID'] = aggregated_authors['PMID'].astype(str)
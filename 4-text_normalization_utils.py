@@ -4,40 +4,91 @@
 同时完整记录模型的思考过程用于分析，支持断点续传
 """
 
+import array
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import time
 import re
 import unicodedata
 import logging
+import queue
+import atexit
+from logging.handlers import QueueHandler, QueueListener
 import os
 import glob
+import hashlib
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
-from typing import Tuple
+from functools import lru_cache
+from typing import Optional, Tuple
+from request_utils import retry_delay  # 公共的失败重试退避等待
 
 # 设置日志记录（确保能捕获模型完整思考过程）
+# 工作线程只把日志记录放入队列，由后台监听线程写文件和控制台，避免I/O阻塞处理线程
+_log_queue = queue.Queue(-1)
+_log_listener = QueueListener(
+    _log_queue,
+    logging.FileHandler(f"author_merge_with_thoughts_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
+    logging.StreamHandler()
+)
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(f"author_merge_with_thoughts_log_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"),
-        logging.StreamHandler()
-    ]
+    handlers=[QueueHandler(_log_queue)]
 )
+_log_listener.start()
+atexit.register(_log_listener.stop)
 logger = logging.getLogger(__name__)
 
+# 匹配英文地址中的"城市, 州缩写"格式（模块级预编译，避免每次调用重新解析）
+LOCATION_PATTERN = re.compile(r'([A-Za-z\s]+),\s*([A-Z]{2})\s*,?\s*(USA|United States|[\d\s]+)?')
+# 模型回答末尾JSON对象的解码器（从最后一个左花括号起向前逐个尝试解码）
+JSON_DECODER = json.JSONDecoder()
+
+# 同时处理的作者数，以及每个作者内同时提交的记录对判断任务数
+MAX_AUTHOR_WORKERS = 4
+MAX_MODEL_WORKERS = 8
+
+# 所有作者线程合计同时发送给Ollama的请求数，与服务端的 OLLAMA_NUM_PARALLEL 保持一致
+# （超出的请求在本地等待，避免在服务端排队时耗尽客户端超时）
+MAX_MODEL_REQUESTS = int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))
+MODEL_REQUEST_SLOTS = threading.BoundedSemaphore(MAX_MODEL_REQUESTS)
+
+# 单个记录对向模型请求的最大尝试次数（超时、连接错误或非200状态码时退避重试）
+MAX_MODEL_RETRIES = 3
+
+# 所有线程共享的模型请求会话（连接池按最大并发数设置，复用长连接）
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(
+    pool_connections=1,
+    pool_maxsize=MAX_MODEL_REQUESTS,
+    max_retries=0
+))
+
+# 模型判断结果的持久化缓存（重跑/断点续传时相同单位对无需再次请求模型）
+LLM_CACHE_PATH = "./output/llm_pair_cache.sqlite"
+_cache_lock = threading.Lock()
+_cache_conn = None
+
 # ---------------------- 并查集类用于高效合并 ----------------------
 class UnionFind:
     """并查集类，用于高效合并相似记录"""
     def __init__(self, n):
-        self.parent = list(range(n))
-        self.rank = [0] * n
+        # 使用连续的C数组存储；按集合大小合并（大树作为根）
+        self.parent = array.array('i', range(n))
+        self.size = array.array('i', [1]) * n
         
     def find(self, x):
-        if self.parent[x] != x:
-            self.parent[x] = self.find(self.parent[x])
-        return self.parent[x]
+        # 迭代式路径减半：单趟遍历，避免递归调用开销与RecursionError
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
     
     def union(self, x, y):
         root_x = self.find(x)
@@ -46,37 +97,112 @@ class UnionFind:
         if root_x == root_y:
             return
             
-        if self.rank[root_x] < self.rank[root_y]:
-            self.parent[root_x] = root_y
-        elif self.rank[root_x] > self.rank[root_y]:
-            self.parent[root_y] = root_x
-        else:
-            self.parent[root_y] = root_x
-            self.rank[root_x] += 1
+        if self.size[root_x] < self.size[root_y]:
+            root_x, root_y = root_y, root_x
+        self.parent[root_y] = root_x
+        self.size[root_x] += self.size[root_y]
 
 # ---------------------- 辅助函数：提取地址中的"城市+州"信息 ----------------------
+@lru_cache(maxsize=4096)
 def extract_location(affiliation: str) -> str:
-    """提取单位的"城市+州"信息（适配英文地址格式）"""
+    """提取单位的"城市+州"信息（适配英文地址格式），同一单位重复出现时直接命中缓存"""
     if not affiliation:
         return ""
-    location_pattern = r'([A-Za-z\s]+),\s*([A-Z]{2})\s*,?\s*(USA|United States|[\d\s]+)?'
-    match = re.search(location_pattern, affiliation)
+    match = LOCATION_PATTERN.search(affiliation)
     if match:
         city = match.group(1).strip()
         state = match.group(2).strip()
         return f"{city},{state}"
     return ""
 
+# ---------------------- 模型判断结果缓存 ----------------------
+def _get_cache_conn() -> sqlite3.Connection:
+    """延迟打开缓存数据库（多线程共享同一连接，访问时需持有_cache_lock）"""
+    global _cache_conn
+    if _cache_conn is None:
+        _cache_conn = sqlite3.connect(LLM_CACHE_PATH, check_same_thread=False)
+        _cache_conn.execute(
+            "CREATE TABLE IF NOT EXISTS pair_cache (key TEXT PRIMARY KEY, is_same INTEGER, response TEXT)"
+        )
+        # 判断时顺带提取的单位信息，供5-author_data_enrichment.py直接复用
+        _cache_conn.execute(
+            "CREATE TABLE IF NOT EXISTS affiliation_info "
+            "(affiliation TEXT PRIMARY KEY, organization TEXT, city TEXT, country TEXT)"
+        )
+    return _cache_conn
+
+def pair_cache_key(affiliation1: str, affiliation2: str) -> str:
+    """与顺序无关的单位对缓存键（判断只依赖单位信息，不含作者名）"""
+    a, b = sorted([affiliation1.lower(), affiliation2.lower()])
+    return hashlib.blake2b(f"{a}|{b}".encode("utf-8"), digest_size=16).hexdigest()
+
+def load_cached_judgement(key: str) -> Optional[Tuple[bool, str]]:
+    with _cache_lock:
+        row = _get_cache_conn().execute(
+            "SELECT is_same, response FROM pair_cache WHERE key = ?", (key,)
+        ).fetchone()
+    if row is None:
+        return None
+    return bool(row[0]), row[1]
+
+def save_cached_judgement(key: str, is_same: bool, response: str) -> None:
+    with _cache_lock:
+        conn = _get_cache_conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO pair_cache (key, is_same, response) VALUES (?, ?, ?)",
+                (key, int(is_same), response)
+            )
+
+def save_affiliation_info(affiliation: str, info) -> None:
+    """按首个单位（分号前部分，小写）保存模型提取的主要单位、城市和国家"""
+    if not isinstance(info, dict):
+        return
+    fields = [str(info.get(name) or "").strip() for name in ("organization", "city", "country")]
+    if not all(fields):
+        return
+    key = affiliation.split(';')[0].strip().lower()
+    with _cache_lock:
+        conn = _get_cache_conn()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO affiliation_info (affiliation, organization, city, country) VALUES (?, ?, ?, ?)",
+                (key, *fields)
+            )
+
+def parse_model_judgement(full_response: str) -> Tuple[Optional[bool], dict]:
+    """解析模型回答末尾的JSON对象，返回(是否为同一人, JSON内容)；无法解析时返回(None, {})"""
+    answer = full_response.rsplit("</think>", 1)[-1]
+    # 分析过程中也可能出现花括号，因此从最后一个"{"开始向前查找第一个可解码且含布尔字段same的对象
+    # （嵌套的单位信息对象不含same字段，会被跳过，直到外层对象）
+    start = answer.rfind("{")
+    while start != -1:
+        try:
+            data, _ = JSON_DECODER.raw_decode(answer, start)
+        except json.JSONDecodeError:
+            data = None
+        if isinstance(data, dict) and isinstance(data.get("same"), bool):
+            return data["same"], data
+        start = answer.rfind("{", 0, start)
+    return None, {}
+
 # ---------------------- 核心函数：调用模型并记录完整思考过程 ----------------------
-def are_authors_same(affiliation1: str, affiliation2: str, author_name: str, model_endpoint: str) -> Tuple[bool, str]:
+def are_authors_same(affiliation1: str, affiliation2: str, author_name: str, model_endpoint: str) -> Tuple[Optional[bool], str]:
     """
     使用大语言模型判断两个同名作者是否为同一人
-    返回：(是否为同一人, 模型完整思考过程)
+    返回：(是否为同一人, 模型完整思考过程)；
+    多次重试后请求仍失败或模型回答无法解析时返回(None, 错误信息)，表示未能判断（不等同于判定为不同人）
     """
     if pd.isna(affiliation1) or pd.isna(affiliation2) or not affiliation1 or not affiliation2:
-        logger.warning(f"作者 {author_name}：存在空单位信息，直接判定为不同人")
+        logger.warning("作者 %s：存在空单位信息，直接判定为不同人", author_name)
         return False, "存在空单位信息，直接判定为不同人"
     
+    cache_key = pair_cache_key(affiliation1, affiliation2)
+    cached = load_cached_judgement(cache_key)
+    if cached is not None:
+        logger.info("作者 %s：命中模型判断缓存，判断结果：%s", author_name, '是' if cached[0] else '否')
+        return cached
+    
     prompt = f"""
 任务：仅基于单位信息，判断两位同名作者是否为同一人，严格遵循以下优先级规则：
 
@@ -92,57 +218,72 @@ def are_authors_same(affiliation1: str, affiliation2: str, author_name: str, mod
    - 仅部门不同（如"General & Thoracic Surgery" vs "Pediatric Surgery"）但机构+地理相同，判定为同一人。
 
 请先详细分析两个单位的地理信息和机构关系，然后给出判断结果。
-分析过程要清晰展示你的思考逻辑，最后必须以"判断结果：是"或"判断结果：否"结束。
+分析过程要清晰展示你的思考逻辑，最后必须以一个JSON对象结束（不要使用```包裹），格式如下：
+{{"same": true或false, "affiliation1": {{"organization": "主要单位", "city": "城市", "country": "国家"}}, "affiliation2": {{"organization": "主要单位", "city": "城市", "country": "国家"}}}}
+其中affiliation1/affiliation2分别对应单位信息1/单位信息2中的第一个单位（分号前部分）：
+主要单位为层级最高的机构或大学名称；国家必须使用标准全称（如USA应写为United States of America，UK应写为United Kingdom）。
 
 作者姓名: {author_name}
 单位信息1: {affiliation1}
 单位信息2: {affiliation2}
 """
     
-    try:
-        response = requests.post(
-            f"{model_endpoint}/api/generate",
-            json={
-                "model": "deepseek-r1:70b",
-                "prompt": prompt,
-                "stream": False,
-                "options": {
-                    "temperature": 0.1,
-                    "max_tokens": 500  # 增加token限制以确保捕获完整思考过程
-                }
-            },
-            timeout=120  # 延长超时时间，确保模型有足够时间生成思考过程
-        )
-        
-        if response.status_code == 200:
-            result = response.json()
-            full_response = result["response"].strip()  # 保存完整响应（包含思考过程）
-            
-            # 解析最终判断结果
-            if "判断结果：是" in full_response:
-                is_same = True
-            elif "判断结果：否" in full_response:
-                is_same = False
-            else:
-                logger.error(f"作者 {author_name}：模型未按要求格式返回结果，响应内容：{full_response}")
-                return False, full_response
-            
-            # 详细记录完整思考过程（使用INFO级别确保被记录）
-            logger.info(f"\n===== 模型思考过程（作者：{author_name}） =====")
-            logger.info(f"单位1: {affiliation1}")
-            logger.info(f"单位2: {affiliation2}")
-            logger.info(f"思考过程:\n{full_response}")
-            logger.info(f"最终判断: {'是' if is_same else '否'}\n=========================================\n")
-            
-            return is_same, full_response
+    # 超时、连接错误或非200状态码时按退避时间重试，全部失败则返回"未能判断"
+    for retry_count in range(1, MAX_MODEL_RETRIES + 1):
+        try:
+            with MODEL_REQUEST_SLOTS:
+                response = SESSION.post(
+                    f"{model_endpoint}/api/generate",
+                    json={
+                        "model": "deepseek-r1:70b",
+                        "prompt": prompt,
+                        "stream": False,
+                        "options": {
+                            "temperature": 0.1,
+                            "max_tokens": 500  # 增加token限制以确保捕获完整思考过程
+                        }
+                    },
+                    timeout=120  # 延长超时时间，确保模型有足够时间生成思考过程
+                )
+        except requests.RequestException as e:
+            response = None
+            error_msg = f"调用模型时出错: {str(e)}"
         else:
+            if response.status_code == 200:
+                break
             error_msg = f"模型请求失败，状态码: {response.status_code}"
-            logger.error(error_msg)
-            return False, error_msg
-    except Exception as e:
-        error_msg = f"调用模型时出错: {str(e)}"
-        logger.error(error_msg)
-        return False, error_msg
+        logger.error("作者 %s：%s（尝试 %d/%d）", author_name, error_msg, retry_count, MAX_MODEL_RETRIES)
+        if retry_count < MAX_MODEL_RETRIES:
+            time.sleep(retry_delay(retry_count, response))
+    else:
+        return None, error_msg
+    
+    try:
+        full_response = response.json()["response"].strip()  # 保存完整响应（包含思考过程）
+    except (ValueError, KeyError) as e:
+        error_msg = f"解析模型响应时出错: {str(e)}"
+        logger.error("作者 %s：%s", author_name, error_msg)
+        return None, error_msg
+    
+    # 解析最终判断结果（同一次调用中顺带提取两个单位的信息）
+    is_same, judgement = parse_model_judgement(full_response)
+    if is_same is None:
+        logger.error("作者 %s：模型未按要求格式返回结果，响应内容：%s", author_name, full_response)
+        return None, full_response
+    save_affiliation_info(affiliation1, judgement.get("affiliation1"))
+    save_affiliation_info(affiliation2, judgement.get("affiliation2"))
+    
+    # 详细记录完整思考过程（使用INFO级别确保被记录）
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("\n===== 模型思考过程（作者：%s） =====", author_name)
+        logger.info("单位1: %s", affiliation1)
+        logger.info("单位2: %s", affiliation2)
+        logger.info("思考过程:\n%s", full_response)
+        logger.info("最终判断: %s\n=========================================\n", '是' if is_same else '否')
+    
+    # 仅缓存成功解析的结果，请求失败或格式错误时下次仍会重新询问模型
+    save_cached_judgement(cache_key, is_same, full_response)
+    return is_same, full_response
 
 # ---------------------- 文本标准化函数 ----------------------
 def normalize_text(text: str) -> str:
@@ -158,62 +299,95 @@ def format_time(seconds: float) -> str:
     return f"{hours}h {minutes}m {seconds}s"
 
 # ---------------------- 作者分组处理函数 ----------------------
-def process_author_group(author_df: pd.DataFrame, model_endpoint: str) -> pd.DataFrame:
-    """处理作者分组，完整记录模型思考过程"""
+def process_author_group(author_df: pd.DataFrame, model_endpoint: str) -> Tuple[pd.DataFrame, int]:
+    """
+    处理作者分组，完整记录模型思考过程
+    返回：(分配了AuthorID的记录, 模型未能判断且最终仍不在同一组的记录对数量)
+    """
     author_df = author_df.copy()
     author_name = author_df.iloc[0]["Author"] if len(author_df) > 0 else "Unknown"
     n = len(author_df)
     
     if n == 1:
         author_df["AuthorID"] = 0
-        logger.info(f"作者 {author_name}：仅1条记录，分配AuthorID=0")
-        return author_df
+        logger.info("作者 %s：仅1条记录，分配AuthorID=0", author_name)
+        return author_df, 0
     
     uf = UnionFind(n)
     checked_pairs = set()
     
-    # 1. 合并完全相同的单位
-    logger.info(f"作者 {author_name}：开始处理完全相同单位的合并（共{len(author_df)}条记录）")
-    for i in range(n):
-        for j in range(i + 1, n):
-            aff_i = author_df.iloc[i]["Affiliation"]
-            aff_j = author_df.iloc[j]["Affiliation"]
-            if aff_i and aff_j and aff_i.lower() == aff_j.lower():
-                uf.union(i, j)
-                checked_pairs.add((i, j))
-                logger.info(f"作者 {author_name}：记录{i}与记录{j}单位完全相同，直接合并")
+    # 预先取出单位与"城市+州"信息，避免在两两比较中反复使用.iloc
+    affiliations = author_df["Affiliation"].tolist()
+    locations = [extract_location(aff) for aff in affiliations]
+    
+    # 1. 合并完全相同的单位（按小写单位分组哈希，O(n)代替两两比较）
+    logger.info("作者 %s：开始处理完全相同单位的合并（共%d条记录）", author_name, len(author_df))
+    lowered_affs = author_df["Affiliation"].str.lower().fillna("")
+    identical_pair_count = 0
+    for key, positions in lowered_affs.groupby(lowered_affs, sort=False).indices.items():
+        if not key or len(positions) < 2:
+            continue
+        first, *others = positions.tolist()
+        identical_pair_count += len(positions) * (len(positions) - 1) // 2
+        for j in others:
+            uf.union(first, j)
+            checked_pairs.add((first, j))
+            logger.info("作者 %s：记录%d与记录%d单位完全相同，直接合并", author_name, first, j)
     
     # 2. 模型判断非完全相同的单位
-    total_needed_pairs = n*(n-1)//2 - len(checked_pairs)
-    logger.info(f"作者 {author_name}：需模型判断的记录对数量：{total_needed_pairs}")
+    total_needed_pairs = n*(n-1)//2 - identical_pair_count
+    logger.info("作者 %s：需模型判断的记录对数量：%d", author_name, total_needed_pairs)
     
-    for i in range(n):
-        for j in range(i + 1, n):
-            if (i, j) in checked_pairs:
-                continue
+    uf_lock = threading.Lock()
+    unresolved_pairs = []
+
+    def judge_pair(i, j):
+        # 提交后其他记录对的结果可能已将二者并入同组，调用模型前再次确认
+        with uf_lock:
             if uf.find(i) == uf.find(j):
-                logger.debug(f"作者 {author_name}：记录{i}与记录{j}已同组，跳过模型判断")
+                return None
+        
+        loc_i = locations[i]
+        loc_j = locations[j]
+        if loc_i and loc_j and loc_i != loc_j:
+            # "城市+州"不同按规则即判定为不同人，无需调用模型
+            logger.warning("作者 %s：记录%d↔记录%d 跨城市（%s vs %s），直接判定为不同人", author_name, i, j, loc_i, loc_j)
+            return False, f"跨城市短路：{loc_i} vs {loc_j}"
+        
+        # 调用模型并获取思考过程
+        return are_authors_same(affiliations[i], affiliations[j], author_name, model_endpoint)
+    
+    candidate_pairs = [
+        (i, j)
+        for i in range(n)
+        for j in range(i + 1, n)
+        if (i, j) not in checked_pairs and uf.find(i) != uf.find(j)
+    ]
+    
+    # 并发提交所有待判断记录对，按完成顺序合并结果
+    with ThreadPoolExecutor(max_workers=MAX_MODEL_WORKERS) as executor:
+        future_to_pair = {executor.submit(judge_pair, i, j): (i, j) for i, j in candidate_pairs}
+        for future in as_completed(future_to_pair):
+            i, j = future_to_pair[future]
+            result = future.result()
+            if result is None:
+                logger.debug("作者 %s：记录%d↔记录%d 已同组，跳过模型判断", author_name, i, j)
                 continue
             
-            aff_i = author_df.iloc[i]["Affiliation"]
-            aff_j = author_df.iloc[j]["Affiliation"]
-            loc_i = extract_location(aff_i)
-            loc_j = extract_location(aff_j)
-            pair_key = f"记录{i}↔记录{j}"
-            
-            if loc_i and loc_j and loc_i != loc_j:
-                logger.warning(f"作者 {author_name}：{pair_key} 跨城市（{loc_i} vs {loc_j}），进入谨慎判断")
-            
-            # 调用模型并获取思考过程
-            is_same, thought_process = are_authors_same(aff_i, aff_j, author_name, model_endpoint)
-            
-            if is_same:
-                uf.union(i, j)
-                logger.info(f"作者 {author_name}：{pair_key} 模型判定为同一人，执行合并")
+            is_same, thought_process = result
+            if is_same is None:
+                # 请求失败或回答无法解析：未能判断，不能当作"不同人"
+                unresolved_pairs.append((i, j))
+                logger.warning("作者 %s：记录%d↔记录%d 模型未能给出判断，暂不合并", author_name, i, j)
+            elif is_same:
+                with uf_lock:
+                    uf.union(i, j)
+                logger.info("作者 %s：记录%d↔记录%d 模型判定为同一人，执行合并", author_name, i, j)
             else:
-                logger.info(f"作者 {author_name}：{pair_key} 模型判定为不同人，不合并")
-            
-            time.sleep(1)
+                logger.info("作者 %s：记录%d↔记录%d 模型判定为不同人，不合并", author_name, i, j)
+    
+    # 未能判断的记录对若已通过其他记录对并入同组，则不影响分组结果
+    unresolved_count = sum(1 for i, j in unresolved_pairs if uf.find(i) != uf.find(j))
     
     # 3. 分配AuthorID
     group_ids = {}
@@ -225,13 +399,13 @@ def process_author_group(author_df: pd.DataFrame, model_endpoint: str) -> pd.Dat
         root = uf.find(i)
         if root not in group_ids:
             group_ids[root] = next_id
-            sample_unit = author_df.iloc[i]["Affiliation"]
+            sample_unit = affiliations[i]
             if len(sample_unit) > 80:
                 sample_unit = sample_unit[:80] + "..."
             group_details[next_id] = {
                 "record_indices": [i],
                 "sample_unit": sample_unit,
-                "location": extract_location(author_df.iloc[i]["Affiliation"])
+                "location": locations[i]
             }
             next_id += 1
         else:
@@ -244,12 +418,12 @@ def process_author_group(author_df: pd.DataFrame, model_endpoint: str) -> pd.Dat
     author_df["AuthorID"] = author_ids
     
     # 输出最终分组日志
-    logger.info(f"作者 {author_name}：最终分组结果（共{next_id}个实际作者）")
+    logger.info("作者 %s：最终分组结果（共%d个实际作者）", author_name, next_id)
     for group_id, details in group_details.items():
         indices = details["record_indices"]
-        logger.info(f"  AuthorID={group_id}：包含记录{indices}，单位示例：{details['sample_unit']}")
+        logger.info("  AuthorID=%d：包含记录%s，单位示例：%s", group_id, indices, details['sample_unit'])
     
-    return author_df
+    return author_df, unresolved_count
 
 # ---------------------- 主函数 ----------------------
 def main():
@@ -289,7 +463,7 @@ def main():
         
         # 检查是否存在临时文件，实现断点续传
         processed_authors = set()
-        results = []
+        temp_has_data = False
         
         # 检查固定临时文件是否存在
         if os.path.exists(temp_output_path):
@@ -298,14 +472,15 @@ def main():
                 temp_df = pd.read_csv(temp_output_path, encoding='utf-8')
                 # 获取已处理的作者列表
                 processed_authors = set(temp_df["Author"].unique())
-                results.append(temp_df)
+                temp_has_data = True
                 logger.info(f"已处理作者数量: {len(processed_authors)}")
             except Exception as e:
                 logger.error(f"读取临时文件失败: {str(e)}")
                 processed_authors = set()
         
-        # 按作者名分组处理
-        unique_authors = df["Author"].unique()
+        # 按作者名分组处理（一次groupby建立分组索引，避免每个作者全表扫描）
+        author_groups = {author: group.reset_index(drop=True) for author, group in df.groupby("Author", sort=False)}
+        unique_authors = list(author_groups.keys())
         # 过滤掉已处理的作者
         remaining_authors = [author for author in unique_authors if author not in processed_authors]
         total_authors = len(remaining_authors)
@@ -319,31 +494,59 @@ def main():
             return
         
         logger.info(f"开始处理 {total_authors} 个未处理作者名")
+        unresolved_authors = []
         
-        for idx, author in enumerate(remaining_authors, 1):
-            elapsed_time = time.time() - start_time
-            avg_time_per_author = elapsed_time / idx if idx > 0 else 0
-            remaining_count = total_authors - idx
-            estimated_remaining = avg_time_per_author * remaining_count
-            
-            logger.info("="*50)
-            logger.info(f"进度：{idx}/{total_authors} | 当前处理作者：{author}")
-            logger.info(f"已用时间：{format_time(elapsed_time)} | 预计剩余时间：{format_time(estimated_remaining)}")
-            logger.info("="*50)
-            
-            author_subset = df[df["Author"] == author].reset_index(drop=True)
-            logger.info(f"作者 {author}：提取到 {len(author_subset)} 条记录")
-            processed_subset = process_author_group(author_subset, OLLAMA_ENDPOINT)
-            results.append(processed_subset)
-            
-            # 每处理5个作者保存一次中间结果
-            if idx % 5 == 0:
-                temp_df = pd.concat(results, ignore_index=True)
-                temp_df.to_csv(temp_output_path, index=False, encoding='utf-8')
-                logger.info(f"已保存中间结果（处理{idx}个作者），路径：{temp_output_path}")
+        # 各作者分组相互独立且主要在等待模型响应，并发处理多个作者
+        with ThreadPoolExecutor(max_workers=MAX_AUTHOR_WORKERS) as executor:
+            future_to_author = {
+                executor.submit(process_author_group, author_groups[author], OLLAMA_ENDPOINT): author
+                for author in remaining_authors
+            }
+            try:
+                for idx, future in enumerate(as_completed(future_to_author), 1):
+                    author = future_to_author[future]
+                    processed_subset, unresolved_count = future.result()
+                    
+                    elapsed_time = time.time() - start_time
+                    avg_time_per_author = elapsed_time / idx if idx > 0 else 0
+                    remaining_count = total_authors - idx
+                    estimated_remaining = avg_time_per_author * remaining_count
+                    
+                    logger.info("="*50)
+                    logger.info(f"进度：{idx}/{total_authors} | 完成处理作者：{author}（{len(processed_subset)} 条记录）")
+                    logger.info(f"已用时间：{format_time(elapsed_time)} | 预计剩余时间：{format_time(estimated_remaining)}")
+                    logger.info("="*50)
+                    
+                    if unresolved_count:
+                        # 存在未能判断的记录对时不写入临时文件，下次运行重新处理该作者（已判断的记录对命中缓存）
+                        unresolved_authors.append(author)
+                        logger.warning(f"作者 {author}：{unresolved_count} 个记录对模型未能判断，暂不保存，下次运行将重新处理")
+                        continue
+                    
+                    # 每处理完一个作者即追加写入临时文件（仅在主线程写入，无需加锁）
+                    processed_subset.to_csv(
+                        temp_output_path,
+                        mode='a' if temp_has_data else 'w',
+                        header=not temp_has_data,
+                        index=False,
+                        encoding='utf-8'
+                    )
+                    temp_has_data = True
+                    if idx % 5 == 0:
+                        logger.info(f"已保存中间结果（处理{idx}个作者），路径：{temp_output_path}")
+            except BaseException:
+                # 出错时取消尚未开始的作者，已完成的结果均已写入临时文件
+                for pending in future_to_author:
+                    pending.cancel()
+                raise
         
-        # 生成最终结果
-        final_df = pd.concat(results, ignore_index=True)
+        if unresolved_authors:
+            logger.warning(f"{len(unresolved_authors)} 个作者存在模型未能判断的记录对，未生成最终结果；"
+                           f"请确认模型服务正常后重新运行，已完成的作者将从临时文件续传")
+            return
+        
+        # 生成最终结果（临时文件已包含全部作者，读回一次即可）
+        final_df = pd.read_csv(temp_output_path, encoding='utf-8')
         final_df.to_csv(output_path, index=False, encoding='utf-8')
         
         # 输出统计摘要
@@ -366,11 +569,9 @@ def main():
     except Exception as e:
         logger.error(f"程序执行过程中发生致命错误：{str(e)}", exc_info=True)
         
-        # 保存当前进度到临时文件
-        if 'results' in locals() and results:
-            temp_df = pd.concat(results, ignore_index=True)
-            temp_df.to_csv(temp_output_path, index=False, encoding='utf-8')
-            logger.info(f"已保存错误时的临时文件: {temp_output_path}")
+        # 已完成的作者均已逐个追加到临时文件，下次运行可直接续传
+        if os.path.exists(temp_output_path):
+            logger.info(f"已处理的作者结果保存在临时文件: {temp_output_path}")
         return
 
 if __name__ == "__main__":
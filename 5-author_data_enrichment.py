@@ -1,42 +1,55 @@
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import os
+import re
+import sqlite3
+from contextlib import closing
+import json
 from ast import literal_eval
+from itertools import chain
 from tqdm import tqdm
 from concurrent.futures import ThreadPoolExecutor, as_completed
 import threading
+from request_utils import retry_delay  # 公共的失败重试退避等待
 
 # 线程安全锁
 print_lock = threading.Lock()
 save_lock = threading.Lock()
 
+# 同时调用模型的线程数
+MAX_WORKERS = 4
+
+# 所有线程共享的模型请求会话（复用到Ollama的长连接，避免每次请求重新建立连接）
+SESSION = requests.Session()
+SESSION.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS, max_retries=0))
+
+# 模型输出末尾的三行结果（允许行间空行及结尾的```符号）
+OUTPUT_PATTERN = re.compile(r'([^\n`]*\S[^\n`]*)\n\s*([^\n`]*\S[^\n`]*)\n\s*([^\n`]*\S[^\n`]*)[\s`]*\Z')
+
+# 单位信息缓存：4-text_normalization_utils.py 判断同名作者时顺带提取的结果，以及本脚本提取的结果
+AFFILIATION_CACHE_PATH = "output/llm_pair_cache.sqlite"
+
 def merge_author_records(df):
     """合并相同Author和AuthorID的记录"""
     # 定义合并函数
-    def merge_pmids(pmid_list):
-        """合并PMID列表，去重并保持列表格式"""
-        merged = []
-        for pmids in pmid_list:
-            # 尝试将字符串转换为列表，如果已经是列表则直接使用
+    def parse_pmids(pmids):
+        """将PMID列表字符串解析为列表：优先用json.loads，单引号列表回退到literal_eval，仍失败则保留原始值"""
+        if isinstance(pmids, list):
+            return pmids
+        try:
+            parsed = json.loads(pmids)
+        except (TypeError, ValueError):
             try:
-                if isinstance(pmids, str):
-                    pmid_list = literal_eval(pmids)
-                else:
-                    pmid_list = pmids
-                merged.extend(pmid_list)
-            except:
-                # 如果解析失败，直接添加原始值
-                merged.append(str(pmids))
-        
-        # 去重并保持顺序
-        seen = set()
-        result = []
-        for pmid in merged:
-            if pmid not in seen:
-                seen.add(pmid)
-                result.append(pmid)
-        return result
+                parsed = literal_eval(pmids)
+            except (TypeError, ValueError, SyntaxError, MemoryError, RecursionError):
+                return [str(pmids)]
+        return parsed if isinstance(parsed, (list, tuple)) else [str(pmids)]
+    
+    def merge_pmids(pmid_list):
+        """合并PMID列表，去重并保持列表格式（dict.fromkeys去重且保持首次出现顺序）"""
+        return list(dict.fromkeys(chain.from_iterable(parse_pmids(pmids) for pmids in pmid_list)))
     
     def get_longest_affiliation(affiliations):
         """选择最长的单位信息"""
@@ -48,12 +61,47 @@ def merge_author_records(df):
     # 按Author和AuthorID分组并合并
     grouped = df.groupby(['Author', 'AuthorID']).agg(
         Affiliation=('Affiliation', get_longest_affiliation),
-        PMID=('PMID', merge_pmids),
-        PMID_Count=('PMID', lambda x: len(merge_pmids(x)))
+        PMID=('PMID', merge_pmids)
     ).reset_index()
+    # 直接由已合并的PMID列表计算数量，避免重复合并
+    grouped['PMID_Count'] = grouped['PMID'].map(len)
     
     return grouped
 
+def first_affiliation_key(affiliation):
+    """取第一条单位信息（分号前部分）并转为小写，作为单位信息的查找键"""
+    return str(affiliation).split(';')[0].strip().lower()
+
+def load_known_affiliations(cache_path=AFFILIATION_CACHE_PATH):
+    """读取已由模型提取的单位信息，返回 {单位键: (主要单位, 城市, 国家)}"""
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with closing(sqlite3.connect(cache_path)) as conn:
+            rows = conn.execute("SELECT affiliation, organization, city, country FROM affiliation_info").fetchall()
+    except sqlite3.Error:
+        return {}
+    return {row[0]: tuple(row[1:]) for row in rows}
+
+def save_known_affiliations(records, cache_path=AFFILIATION_CACHE_PATH):
+    """将新提取的单位信息 (单位键, 主要单位, 城市, 国家) 写入单位缓存"""
+    if not records:
+        return
+    try:
+        with closing(sqlite3.connect(cache_path)) as conn:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS affiliation_info "
+                    "(affiliation TEXT PRIMARY KEY, organization TEXT, city TEXT, country TEXT)"
+                )
+                conn.executemany(
+                    "INSERT OR REPLACE INTO affiliation_info (affiliation, organization, city, country) VALUES (?, ?, ?, ?)",
+                    records
+                )
+    except sqlite3.Error as e:
+        with print_lock:
+            print(f"保存单位缓存失败：{str(e)}")
+
 def extract_affiliation_info(affiliation, model="deepseek-r1:70b", index=None, max_retries=3):
     """调用ollama的大语言模型提取单位信息，增加重试机制和输出过滤"""
     # 只取第一条单位信息（分号前的部分）
@@ -92,7 +140,7 @@ United States of America
     retry_count = 0
     while retry_count < max_retries:
         try:
-            response = requests.post(
+            response = SESSION.post(
                 "http://localhost:11434/api/generate",
                 json={
                     "model": model,
@@ -111,31 +159,33 @@ United States of America
                     print(f"\n处理单位信息 (索引 {index})：{first_affiliation}")
                     print(f"模型输出：\n{output}\n{'-'*50}")
                 
-                # 解析输出结果 - 过滤掉包含```的行和空行
-                lines = []
-                for line in output.split('\n'):
-                    stripped_line = line.strip()
-                    if stripped_line and '```' not in stripped_line:
-                        lines.append(stripped_line)
-                
-                # 确保我们有足够的有效行
-                line_count = len(lines)
-                organization = lines[-3].strip() if line_count >= 3 else "未知"
-                city = lines[-2].strip() if line_count >= 2 else "未知"
-                country = lines[-1].strip() if line_count >= 1 else "未知"
+                # 解析输出结果 - 取思考过程之后的最后三行（单位、城市、国家）
+                match = OUTPUT_PATTERN.search(output.rsplit('</think>', 1)[-1])
+                if match:
+                    organization, city, country = (part.strip() for part in match.groups())
+                else:
+                    # 格式不符时回退：过滤掉包含```的行和空行后按行取值
+                    lines = [line.strip() for line in output.split('\n')
+                             if line.strip() and '```' not in line]
+                    line_count = len(lines)
+                    organization = lines[-3] if line_count >= 3 else "未知"
+                    city = lines[-2] if line_count >= 2 else "未知"
+                    country = lines[-1] if line_count >= 1 else "未知"
                 
                 return (index, organization, city, country)
             else:
                 with print_lock:
                     print(f"API调用失败 (索引 {index})，状态码：{response.status_code}，重试次数：{retry_count+1}")
                 retry_count += 1
-                time.sleep(2)  # 重试前短暂等待
+                if retry_count < max_retries:
+                    time.sleep(retry_delay(retry_count, response))  # 仅在失败后退避等待
                 
         except Exception as e:
             with print_lock:
                 print(f"调用模型时发生错误 (索引 {index})：{str(e)}，重试次数：{retry_count+1}")
             retry_count += 1
-            time.sleep(2)  # 重试前短暂等待
+            if retry_count < max_retries:
+                time.sleep(retry_delay(retry_count))
     
     # 多次重试失败后返回未知
     return (index, "未知", "未知", "未知")
@@ -228,22 +278,25 @@ def main():
     if os.path.exists(cache_file):
         try:
             cache_df = pd.read_csv(cache_file, encoding='utf-8-sig')
-            # 仅恢复已处理的字段
-            for idx in range(len(merged_df)):
-                if idx < len(cache_df) and cache_df.at[idx, 'MainAffiliation'] != "":
-                    merged_df.at[idx, 'MainAffiliation'] = cache_df.at[idx, 'MainAffiliation']
-                    merged_df.at[idx, 'City'] = cache_df.at[idx, 'City']
-                    merged_df.at[idx, 'Country'] = cache_df.at[idx, 'Country']
+            # 仅恢复已处理的字段（按行位置对齐，整列向量化替换）
+            n = min(len(merged_df), len(cache_df))
+            restore_columns = ['MainAffiliation', 'City', 'Country']
+            cached = cache_df.loc[:n - 1, restore_columns]
+            restore_mask = cached['MainAffiliation'].fillna("").ne("")
+            for col in restore_columns:
+                merged_df.loc[:n - 1, col] = merged_df.loc[:n - 1, col].where(~restore_mask, cached[col])
             processed_count = sum(merged_df['MainAffiliation'] != "")
             print(f"已加载缓存文件，恢复 {processed_count} 条已处理记录")
         except Exception as e:
             print(f"加载缓存文件失败，将继续处理：{str(e)}")
     
     # 筛选未处理的记录
-    unprocessed_indices = [idx for idx, row in merged_df.iterrows() 
-                          if row['MainAffiliation'] == "" or 
-                          row['Country'] in ("", "```") or 
-                          pd.isna(row['Country'])]
+    unprocessed_mask = (
+        (merged_df['MainAffiliation'] == "")
+        | merged_df['Country'].isin(["", "```"])
+        | merged_df['Country'].isna()
+    )
+    unprocessed_indices = merged_df.index[unprocessed_mask].tolist()
     
     if not unprocessed_indices:
         print("所有记录已处理完毕，无需继续")
@@ -256,30 +309,70 @@ def main():
     save_interval = 5  # 每处理5条记录更新一次缓存
     processed_count = sum(merged_df['MainAffiliation'] != "")  # 初始已处理数量
     
-    # 调整线程数
-    max_workers = 4
+    # 复用已提取的单位信息（作者消歧阶段顺带提取的，以及往次运行本脚本提取的），命中的记录无需再次调用模型
+    known_affiliations = load_known_affiliations()
+    affiliation_keys = merged_df.loc[unprocessed_indices, 'Affiliation'].map(first_affiliation_key)
+    hits = affiliation_keys[affiliation_keys.isin(known_affiliations.keys())]
+    if not hits.empty:
+        merged_df.update(pd.DataFrame(
+            hits.map(known_affiliations).tolist(),
+            index=hits.index,
+            columns=['MainAffiliation', 'City', 'Country']
+        ))
+        affiliation_keys = affiliation_keys.drop(hits.index)
+        print(f"复用已提取的单位信息：{len(hits)} 条记录，剩余 {len(affiliation_keys)} 条需调用模型")
+    
+    # 准备未处理的任务：相同的首个单位只调用一次模型，结果分发到所有对应记录
+    key_to_indices = {key: list(indices) for key, indices in affiliation_keys.groupby(affiliation_keys, sort=False).groups.items()}
+    tasks = [(merged_df.at[indices[0], 'Affiliation'], key) for key, indices in key_to_indices.items()]
     
-    # 准备未处理的任务
-    tasks = [(merged_df.at[idx, 'Affiliation'], idx) for idx in unprocessed_indices]
+    # 结果先缓冲在字典中，到保存点时再按列批量写回DataFrame，避免逐单元格赋值
+    buf_org, buf_city, buf_country = {}, {}, {}
+    new_affiliations = []
+    
+    def flush_buffers():
+        if not buf_org:
+            return
+        merged_df.update(pd.DataFrame({
+            'MainAffiliation': buf_org,
+            'City': buf_city,
+            'Country': buf_country
+        }))
+        buf_org.clear()
+        buf_city.clear()
+        buf_country.clear()
+        # 新提取的单位信息同时写入单位缓存，供后续运行复用
+        save_known_affiliations(new_affiliations)
+        new_affiliations.clear()
     
     # 并行处理
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        futures = [executor.submit(extract_affiliation_info, aff, "deepseek-r1:70b", idx) 
-                  for aff, idx in tasks]
+    unsaved_count = 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = [executor.submit(extract_affiliation_info, aff, "deepseek-r1:70b", key) 
+                  for aff, key in tasks]
         
         # 处理结果并更新缓存
-        for future in tqdm(as_completed(futures), total=len(unprocessed_indices), desc="处理进度"):
-            with save_lock:
-                idx, org, city, country = future.result()
-                merged_df.at[idx, 'MainAffiliation'] = org
-                merged_df.at[idx, 'City'] = city
-                merged_df.at[idx, 'Country'] = country
-                
-                processed_count += 1
-                
-                # 每处理指定数量的记录，更新一次缓存
-                if processed_count % save_interval == 0:
+        for future in tqdm(as_completed(futures), total=len(tasks), desc="处理进度"):
+            key, org, city, country = future.result()
+            for idx in key_to_indices[key]:
+                buf_org[idx] = org
+                buf_city[idx] = city
+                buf_country[idx] = country
+            if "未知" not in (org, city, country):
+                new_affiliations.append((key, org, city, country))
+            
+            processed_count += len(key_to_indices[key])
+            unsaved_count += 1
+            
+            # 每处理指定数量的单位，批量写回并更新一次缓存
+            if unsaved_count >= save_interval:
+                with save_lock:
+                    flush_buffers()
                     save_cache(merged_df, cache_file)
+                unsaved_count = 0
+    
+    # 写回最后一批未到保存点的结果
+    flush_buffers()
     
     # 处理完成后，保存最终结果
     total_time = time.time() - start_time
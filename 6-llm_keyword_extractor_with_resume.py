@@ -1,19 +1,55 @@
 import pandas as pd
 import requests
+from requests.adapters import HTTPAdapter
 import json
 import os
-import chardet  # 用于检测文件编码
+import time
+import random
+from csv_encoding_utils import detect_file_encoding, read_csv_with_fallback  # 公共的编码检测与回退读取
+try:
+    import orjson  # 可选依赖：C实现的JSON编解码，直接处理UTF-8字节
+    json_loads = orjson.loads
+    json_dumps = orjson.dumps
+except ImportError:
+    json_loads = json.loads
+    def json_dumps(obj):
+        """序列化为UTF-8字节（与orjson.dumps的返回类型一致）"""
+        return json.dumps(obj, ensure_ascii=False).encode('utf-8')
 from tqdm import tqdm
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-def detect_file_encoding(file_path):
-    """检测文件编码格式"""
-    with open(file_path, 'rb') as f:
-        raw_data = f.read(10000)  # 读取前10KB数据用于检测
-    result = chardet.detect(raw_data)
-    return result['encoding']
+# 同时发送给Ollama的请求数，与服务端的 OLLAMA_NUM_PARALLEL 保持一致
+MAX_WORKERS = int(os.environ.get("OLLAMA_NUM_PARALLEL", 4))
 
-def extract_keywords(abstract):
-    """调用ollama部署的模型提取关键词，修复编码问题"""
+# 模型请求的最大尝试次数，以及可重试的HTTP状态码（限流/服务端过载）
+MAX_RETRIES = 5
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 529}
+
+# 关闭思考过程时单次生成的token上限：5个关键词每行仅几个token，足够且避免模型无限生成
+MAX_OUTPUT_TOKENS = 128
+
+# 支持 "think" 参数的最低Ollama版本（更早的版本会忽略该字段，模型仍先输出<think>思考过程）
+MIN_THINK_VERSION = (0, 9)
+
+# 所有线程共享的模型请求会话（复用到Ollama的长连接）
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS, max_retries=0))
+
+def server_supports_think():
+    """查询Ollama版本，判断是否支持关闭思考过程（无法获取版本时按不支持处理）"""
+    try:
+        response = SESSION.get("http://localhost:11434/api/version", timeout=10)
+        version = response.json()["version"]
+        major, minor = (int(part) for part in version.split(".")[:2])
+    except (requests.RequestException, ValueError, KeyError, TypeError):
+        return False
+    return (major, minor) >= MIN_THINK_VERSION
+
+def extract_keywords(abstract, disable_thinking=False):
+    """
+    调用ollama部署的模型提取关键词，修复编码问题
+    disable_thinking 为True时关闭模型思考过程并限制生成长度（需服务端支持think参数）
+    """
     # 确保摘要文本是字符串格式，避免编码问题
     if not isinstance(abstract, str):
         abstract = str(abstract)
@@ -45,65 +81,123 @@ Pediatric Patients
 Diagnosis and Treatment
 """
     
-    # 调用ollama的API
-    try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "deepseek-r1:70b",
-                "prompt": prompt,
-                "stream": False
-            },
-            headers={"Content-Type": "application/json; charset=utf-8"},
-            timeout=180  # 设置超时时间
-        )
+    payload = {
+        "model": "deepseek-r1:70b",
+        "prompt": prompt,
+        "stream": False,
+        "options": {
+            "temperature": 0.1,
+            "top_k": 10
+        }
+    }
+    if disable_thinking:
+        # 关闭推理模型的思考过程，只生成5行关键词，此时才能安全地限制生成长度
+        # （思考过程未关闭时token上限会在<think>中途截断，得不到关键词）
+        payload["think"] = False
+        payload["options"]["num_predict"] = MAX_OUTPUT_TOKENS
+        payload["options"]["stop"] = ["\n\n\n"]
+    
+    # 调用ollama的API，遇到超时、连接错误或服务端过载时指数退避重试
+    for attempt in range(MAX_RETRIES):
+        try:
+            response = SESSION.post(
+                "http://localhost:11434/api/generate",
+                data=json_dumps(payload),
+                headers={"Content-Type": "application/json; charset=utf-8"},
+                timeout=(10, 300)  # 连接超时10秒，读取超时300秒（本地生成较慢）
+            )
+        except (requests.Timeout, requests.ConnectionError) as e:
+            print(f"调用模型时发生错误: {str(e)}（尝试 {attempt + 1}/{MAX_RETRIES}）")
+            if attempt < MAX_RETRIES - 1:
+                time.sleep(random.uniform(2, 4) * (attempt + 1))
+            continue
+        except Exception as e:
+            print(f"调用模型时发生错误: {str(e)}")
+            return ["", "", "", "", ""]
         
-        if response.status_code == 200:
-            try:
-                result_text = response.text
-            except UnicodeDecodeError:
-                result_text = response.content.decode('latin-1')
-                
-            result = json.loads(result_text)
-            output = result["response"].strip()
-            
-            lines = []
-            for line in output.split('\n'):
-                stripped_line = line.strip()
-                if stripped_line and '```' not in stripped_line:
-                    lines.append(stripped_line)
-            
-            if lines and lines[-1] == '```':
-                keywords = lines[-6:-1]
-            else:
-                keywords = lines[-5:]
-            
-            while len(keywords) < 5:
-                keywords.append("")
-                
-            return keywords[:5]
-        else:
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            print(f"API请求失败，状态码: {response.status_code}（尝试 {attempt + 1}/{MAX_RETRIES}）")
+            if attempt < MAX_RETRIES - 1:
+                time.sleep(random.uniform(2, 4) * (attempt + 1))
+            continue
+        
+        if response.status_code != 200:
             print(f"API请求失败，状态码: {response.status_code}")
             return ["", "", "", "", ""]
-    except Exception as e:
-        print(f"调用模型时发生错误: {str(e)}")
-        return ["", "", "", "", ""]
+        
+        try:
+            # 直接解析原始字节，免去先解码为文本再解析的额外一遍
+            result = json_loads(response.content)
+            output = result["response"].strip()
+        except Exception as e:
+            print(f"解析模型响应时发生错误: {str(e)}")
+            return ["", "", "", "", ""]
+        
+        # 只取思考过程之后的回答；思考过程未结束（被截断）时没有关键词，按失败处理
+        output = output.rsplit('</think>', 1)[-1]
+        if '<think>' in output:
+            print("模型输出在思考过程中被截断，未得到关键词")
+            return ["", "", "", "", ""]
+        
+        lines = []
+        for line in output.split('\n'):
+            stripped_line = line.strip()
+            if stripped_line and '```' not in stripped_line:
+                lines.append(stripped_line)
+        
+        if lines and lines[-1] == '```':
+            keywords = lines[-6:-1]
+        else:
+            keywords = lines[-5:]
+        
+        while len(keywords) < 5:
+            keywords.append("")
+            
+        return keywords[:5]
+    
+    print(f"多次重试后仍失败，放弃该条记录")
+    return ["", "", "", "", ""]
 
-def is_abstract_valid(abstract):
-    """检查摘要是否有效（非空）"""
-    if pd.isna(abstract):
-        return False
-    if not isinstance(abstract, str):
-        abstract = str(abstract)
-    return abstract.strip() != ""
+def abstract_valid_mask(abstracts):
+    """按列检查摘要是否有效（非空），返回布尔Series"""
+    return abstracts.fillna("").astype(str).str.strip() != ""
+
+def keywords_empty_mask(keywords):
+    """按列检查关键词是否为空（空值、空字符串或"[]"），返回布尔Series"""
+    stripped = keywords.fillna("").astype(str).str.strip()
+    return (stripped == "") | (stripped == "[]")
+
+def load_keyword_checkpoint(checkpoint_file):
+    """读取JSONL检查点，返回 {PMID: 关键词列表字符串}（跳过中断时未写完整的行）"""
+    restored = {}
+    if not os.path.exists(checkpoint_file):
+        return restored
+    with open(checkpoint_file, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+                restored[str(record['PMID'])] = json.dumps(record['Keywords'], ensure_ascii=False)
+            except (json.JSONDecodeError, KeyError, TypeError):
+                continue
+    return restored
+
+def open_keyword_checkpoint(checkpoint_file):
+    """以追加模式打开JSONL检查点；若上次中断时最后一行未写完，先补一个换行避免与新记录粘连"""
+    needs_newline = False
+    if os.path.exists(checkpoint_file) and os.path.getsize(checkpoint_file) > 0:
+        with open(checkpoint_file, 'rb') as f:
+            f.seek(-1, os.SEEK_END)
+            needs_newline = f.read(1) != b'\n'
+    f = open(checkpoint_file, 'a', encoding='utf-8')
+    if needs_newline:
+        f.write('\n')
+    return f
 
-def is_keywords_empty(keywords):
-    """检查关键词是否为空"""
-    if pd.isna(keywords):
-        return True
-    if not isinstance(keywords, str):
-        keywords = str(keywords)
-    return keywords.strip() == "" or keywords.strip() == "[]"
+def save_final_output(df, output_file, checkpoint_file):
+    """一次性写出最终CSV，成功后删除已合并的JSONL检查点"""
+    df.to_csv(output_file, index=False, encoding='utf-8-sig')
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
 
 def process_pubmed_data(input_file, output_file):
     """处理PubMed数据，提取关键词并保存，支持断点续处理"""
@@ -132,10 +226,8 @@ def process_pubmed_data(input_file, output_file):
             file_encoding = 'utf-8'
         
         try:
-            df = pd.read_csv(input_file, encoding=file_encoding)
-        except UnicodeDecodeError:
-            print(f"使用{file_encoding}编码读取失败，尝试使用utf-8-sig编码")
-            df = pd.read_csv(input_file, encoding='utf-8-sig')
+            # 检测到的编码解码失败时依次回退到 GBK、Latin-1
+            df = read_csv_with_fallback(input_file, encoding=file_encoding)
         except Exception as e:
             print(f"读取CSV文件失败: {str(e)}")
             return
@@ -145,22 +237,24 @@ def process_pubmed_data(input_file, output_file):
     if 'Keywords' not in df.columns:
         df['Keywords'] = ""
     
-    # 统计各类记录数量
-    total = len(df)
-    processed = 0  # 有摘要且有关键词
-    no_abstract = 0  # 无摘要
-    to_process = 0  # 有摘要但无关键词
+    # 从JSONL检查点恢复上次中断前已提取的关键词
+    checkpoint_file = f"{output_file}.jsonl"
+    restored = load_keyword_checkpoint(checkpoint_file)
+    if restored:
+        pmid_keys = df['PMID'].astype(str)
+        restore_mask = pmid_keys.isin(restored.keys())
+        df.loc[restore_mask, 'Keywords'] = pmid_keys[restore_mask].map(restored)
+        print(f"从检查点 {checkpoint_file} 恢复了 {int(restore_mask.sum())} 条记录的关键词")
     
-    for _, row in df.iterrows():
-        has_abstract = is_abstract_valid(row['Abstract'])
-        has_keywords = not is_keywords_empty(row['Keywords'])
-        
-        if has_abstract and has_keywords:
-            processed += 1
-        elif not has_abstract:
-            no_abstract += 1
-        else:
-            to_process += 1
+    # 统计各类记录数量（整列向量化判断）
+    has_abstract = abstract_valid_mask(df['Abstract'])
+    has_no_keywords = keywords_empty_mask(df['Keywords'])
+    pending_mask = has_abstract & has_no_keywords
+    
+    total = len(df)
+    processed = int((has_abstract & ~has_no_keywords).sum())  # 有摘要且有关键词
+    no_abstract = int((~has_abstract).sum())  # 无摘要
+    to_process = int(pending_mask.sum())  # 有摘要但无关键词
     
     print(f"记录状态统计:")
     print(f"  总计: {total} 条")
@@ -171,31 +265,43 @@ def process_pubmed_data(input_file, output_file):
     # 如果没有待处理的记录，直接返回
     if to_process == 0:
         print("所有可处理的记录都已完成，无需继续处理")
+        if restored:
+            save_final_output(df, output_file, checkpoint_file)
+            print(f"已将检查点中的结果合并保存到{output_file}")
         return
     
-    # 处理每条记录
+    # 只收集有摘要但无关键词的记录（已完成的记录不再逐行遍历）
+    pending_abstracts = df.loc[pending_mask, 'Abstract']
+    pending = zip(pending_abstracts.index, pending_abstracts.values)
+    
+    # 并发调用模型，按完成顺序写回结果（慢请求不阻塞快请求）
+    # 每条结果立即追加到JSONL检查点（无需反复重写整个CSV），中断后可据此续处理
+    disable_thinking = server_supports_think()
+    if not disable_thinking:
+        print(f"Ollama版本低于{'.'.join(map(str, MIN_THINK_VERSION))}或无法获取版本，保留模型思考过程且不限制生成长度")
     processed_count = 0
-    for index, row in tqdm(df.iterrows(), total=len(df), desc="处理进度"):
-        # 检查摘要是否有效
-        has_abstract = is_abstract_valid(row['Abstract'])
-        # 检查关键词是否为空
-        has_no_keywords = is_keywords_empty(row['Keywords'])
-        
-        # 根据规则决定是否处理
-        if has_abstract and has_no_keywords:
-            # 有摘要但无关键词，需要处理
-            keywords = extract_keywords(row['Abstract'])
-            df.at[index, 'Keywords'] = str(keywords)
+    failed_count = 0
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor, open_keyword_checkpoint(checkpoint_file) as checkpoint:
+        future_to_index = {
+            executor.submit(extract_keywords, abstract, disable_thinking): index
+            for index, abstract in pending
+        }
+        for future in tqdm(as_completed(future_to_index), total=len(future_to_index), desc="处理进度"):
+            index = future_to_index[future]
+            keywords = future.result()
+            if not any(keywords):
+                # 提取失败：不写入结果和检查点，下次运行时仍作为待处理记录重新提取
+                failed_count += 1
+                continue
+            # 以JSON列表字符串保存（同时是合法的Python字面量，下游literal_eval仍可解析）
+            df.at[index, 'Keywords'] = json.dumps(keywords, ensure_ascii=False)
+            checkpoint.write(json.dumps({'PMID': str(df.at[index, 'PMID']), 'Keywords': keywords}, ensure_ascii=False) + '\n')
+            checkpoint.flush()
             processed_count += 1
-            
-            # 每处理10条记录保存一次，防止意外丢失
-            if processed_count % 10 == 0:
-                df.to_csv(output_file, index=False, encoding='utf-8-sig')
-                print(f"\n已处理 {processed_count} 条记录，已保存到文件")
     
-    # 最后保存一次
-    df.to_csv(output_file, index=False, encoding='utf-8-sig')
-    print(f"\n处理完成，共处理了 {processed_count} 条记录，结果已保存到{output_file}")
+    # 全部完成后一次性写出CSV
+    save_final_output(df, output_file, checkpoint_file)
+    print(f"\n处理完成，共处理了 {processed_count} 条记录（失败 {failed_count} 条），结果已保存到{output_file}")
     print(f"当前状态: 已处理 {processed + processed_count} 条，待处理 {to_process - processed_count} 条")
 
 if __name__ == "__main__":
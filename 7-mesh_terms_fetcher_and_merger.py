@@ -1,78 +1,131 @@
 import pandas as pd
 import os
-import time
-from Bio import Entrez
+import io
+import json
+import sqlite3
+from contextlib import closing
+import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from lxml import etree
 from tqdm import tqdm
+from request_utils import RateLimiter  # 公共的线程安全限速器
+
+# !!! 关键：NCBI 要求提供一个邮箱地址
+NCBI_EMAIL = "your.email@example.com"  # 请替换为您自己的邮箱
+# 可选：NCBI API Key（通过环境变量提供），有Key时每秒可请求10次，否则3次
+NCBI_API_KEY = os.environ.get("NCBI_API_KEY")
+EFETCH_URL = "https://eutils.ncbi.nlm.nih.gov/entrez/eutils/efetch.fcgi"
+
+# 并发批次数与每秒请求数上限遵循 NCBI 的限制
+REQUESTS_PER_SECOND = 10 if NCBI_API_KEY else 3
+MAX_WORKERS = REQUESTS_PER_SECOND
+
+# 所有线程共享的会话（复用到 E-utilities 的连接）
+SESSION = requests.Session()
+SESSION.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=MAX_WORKERS, max_retries=0))
+
+RATE_LIMITER = RateLimiter(REQUESTS_PER_SECOND)
+
+# 本地 MeSH 缓存：已获取过的 PMID 重新运行时不再请求 NCBI
+# 新收录的论文要在数周到数月后才完成 MeSH 标引，因此只缓存非空的词条列表，空结果下次运行时重新请求
+MESH_CACHE_PATH = os.path.join('output', 'mesh_cache.db')
+
+def load_cached_mesh(cache_path=MESH_CACHE_PATH):
+    """读取已缓存的 MeSH 词条，返回 {PMID: [MeSH list]}（忽略旧版本写入的空列表）"""
+    if not os.path.exists(cache_path):
+        return {}
+    try:
+        with closing(sqlite3.connect(cache_path)) as conn:
+            rows = conn.execute("SELECT pmid, terms FROM mesh").fetchall()
+    except sqlite3.Error:
+        return {}
+    cached = {pmid: json.loads(terms) for pmid, terms in rows}
+    return {pmid: terms for pmid, terms in cached.items() if terms}
+
+def save_cached_mesh(pmid_to_mesh, cache_path=MESH_CACHE_PATH):
+    """将一个批次获取到的 MeSH 词条写入缓存（尚未标引或解析出错的空列表不写入）"""
+    pmid_to_mesh = {pmid: terms for pmid, terms in pmid_to_mesh.items() if terms}
+    if not pmid_to_mesh:
+        return
+    try:
+        with closing(sqlite3.connect(cache_path)) as conn:
+            with conn:
+                conn.execute("CREATE TABLE IF NOT EXISTS mesh (pmid TEXT PRIMARY KEY, terms TEXT)")
+                conn.executemany(
+                    "INSERT OR REPLACE INTO mesh (pmid, terms) VALUES (?, ?)",
+                    [(pmid, json.dumps(terms, ensure_ascii=False)) for pmid, terms in pmid_to_mesh.items()]
+                )
+    except sqlite3.Error as e:
+        tqdm.write(f"保存 MeSH 缓存失败：{str(e)}")
 
 def fetch_mesh_in_batches(pmid_list):
     """
-    使用 Biopython (E-utilities) 批量获取 MeSH 词条
+    直接 POST 到 E-utilities efetch 接口批量获取 MeSH 词条
+    （PMID 随请求一并提交，无需先 epost 再 efetch 两次往返）
     """
     
-    # !!! 关键：NCBI 要求提供一个邮箱地址
-    Entrez.email = "your.email@example.com"  # 请替换为您自己的邮箱
-    
     pmid_to_mesh = {} # 用于存储 {PMID: [MeSH list]}
     
     try:
-        # 1. 将PMID列表（纯文本）发送给服务器
-        # epost 会在服务器上缓存这个列表，并返回一个查询密钥
-        print(f"正在向 Entrez epost {len(pmid_list)} 个 PMIDs...")
-        post_handle = Entrez.epost(db="pubmed", id=",".join(map(str, pmid_list)))
-        post_results = Entrez.read(post_handle)
-        post_handle.close()
-        
-        webenv = post_results["WebEnv"]
-        query_key = post_results["QueryKey"]
-
-        # 2. 使用缓存的密钥 (webenv 和 query_key) 批量获取 (efetch) 数据
+        # 1. 通过共享会话直接提交这批PMID
         # rettype='medline', retmode='xml' 可以获取包含MeSH的XML数据
-        print("正在从 Entrez efetch 批量获取数据...")
-        fetch_handle = Entrez.efetch(
-            db="pubmed",
-            webenv=webenv,
-            query_key=query_key,
-            rettype="medline",
-            retmode="xml"
-        )
+        params = {
+            "db": "pubmed",
+            "id": ",".join(map(str, pmid_list)),
+            "rettype": "medline",
+            "retmode": "xml",
+            "tool": "biopython",
+            "email": NCBI_EMAIL
+        }
+        if NCBI_API_KEY:
+            params["api_key"] = NCBI_API_KEY
         
-        # 3. 解析XML数据
-        # Entrez.read 会智能地处理整个XML流
-        print("正在解析XML数据...")
-        records = Entrez.read(fetch_handle)
-        fetch_handle.close()
-
-        # 4. 提取 MeSH 词条
-        # 遍历返回的每篇论文
-        if 'PubmedArticle' in records:
-            for article in records['PubmedArticle']:
-                try:
-                    pmid = article['MedlineCitation']['PMID']
-                    mesh_list = []
-                    
-                    # 检查 'MeshHeadingList' 是否存在
-                    if 'MeshHeadingList' in article['MedlineCitation']:
-                        for mesh_heading in article['MedlineCitation']['MeshHeadingList']:
-                            # MeSH 词条在 'DescriptorName' 字段中
-                            # 我们也可以提取 'QualifierName' (子主题词)，但这里只取主词
-                            # 示例：'Antigen-Presenting Cells'
-                            mesh_term = mesh_heading['DescriptorName'].strip()
-                            
-                            # 有些词条后面会带星号（*）表示主要主题
-                            if mesh_heading.attributes.get('MajorTopicYN', 'N') == 'Y':
-                                mesh_term += "*"
-                                
-                            mesh_list.append(mesh_term)
+        RATE_LIMITER.wait()
+        response = SESSION.post(EFETCH_URL, data=params, timeout=120)
+        response.raise_for_status()
+        fetch_handle = io.BytesIO(response.content)
+        
+        # 2. 流式解析XML数据
+        # 只关心 PMID 和 DescriptorName，逐篇解析后立即释放，内存占用与批次大小无关
+        for _, article in etree.iterparse(fetch_handle, tag='PubmedArticle'):
+            pmid = None
+            try:
+                # 3. 提取 MeSH 词条
+                pmid = article.findtext('MedlineCitation/PMID')
+                if not pmid:
+                    raise KeyError('PMID')
+                mesh_list = []
+                
+                # MeSH 词条在 'DescriptorName' 字段中（没有 MeshHeadingList 时为空列表）
+                # 我们也可以提取 'QualifierName' (子主题词)，但这里只取主词
+                # 示例：'Antigen-Presenting Cells'
+                for mesh_heading in article.iterfind('MedlineCitation/MeshHeadingList/MeshHeading'):
+                    descriptor = mesh_heading.find('DescriptorName')
+                    if descriptor is None:
+                        raise KeyError('DescriptorName')
+                    mesh_term = (descriptor.text or '').strip()
                     
-                    pmid_to_mesh[str(pmid)] = mesh_list
+                    # 有些词条后面会带星号（*）表示主要主题
+                    if descriptor.get('MajorTopicYN', 'N') == 'Y':
+                        mesh_term += "*"
+                        
+                    mesh_list.append(mesh_term)
                 
-                except KeyError as e:
-                    # 如果某篇论文缺少 PMCID 或 MeSH 字段
-                    print(f"\n[Warning] 解析某篇论文时出错 (PMID: {pmid if 'pmid' in locals() else 'Unknown'}): {e}")
-                    if 'pmid' in locals():
-                        pmid_to_mesh[str(pmid)] = [] # 至少给它一个空列表
-                except Exception as e:
-                    print(f"\n[Error] 意外错误: {e}")
+                pmid_to_mesh[pmid.strip()] = mesh_list
+            
+            except KeyError as e:
+                # 如果某篇论文缺少 PMID 或 MeSH 字段
+                print(f"\n[Warning] 解析某篇论文时出错 (PMID: {pmid or 'Unknown'}): {e}")
+                if pmid:
+                    pmid_to_mesh[pmid.strip()] = [] # 至少给它一个空列表
+            except Exception as e:
+                print(f"\n[Error] 意外错误: {e}")
+            finally:
+                # 释放已处理的节点，避免整棵树驻留内存
+                article.clear()
+                while article.getprevious() is not None:
+                    del article.getparent()[0]
 
         return pmid_to_mesh
 
@@ -98,30 +151,31 @@ def main():
     print(f"总共找到 {len(df)} 篇论文。")
 
     # --- 2. 批量获取所有 MeSH ---
-    # 将所有PMID转换为列表
-    all_pmids = df['PMID'].tolist()
+    # 先读取本地缓存，只请求缓存中没有的PMID
+    final_mesh_map = load_cached_mesh() # 存储所有结果
+    all_pmids = [pmid for pmid in dict.fromkeys(df['PMID']) if pmid not in final_mesh_map]
+    print(f"缓存中已有 {len(final_mesh_map)} 篇，需要请求 {len(all_pmids)} 篇。")
     
     # *** 注意 ***
     # 虽然 E-utilities 很强，但一次性提交 6093 个也可能超时
     # 我们将其拆分为更小的批次 (例如每批 500 个)
     
     BATCH_SIZE = 500 
-    final_mesh_map = {} # 存储所有结果
+    batches = [all_pmids[i : i + BATCH_SIZE] for i in range(0, len(all_pmids), BATCH_SIZE)]
     
-    # 使用tqdm显示批次处理进度
-    for i in tqdm(range(0, len(all_pmids), BATCH_SIZE), desc="Processing Batches"):
-        batch_pmids = all_pmids[i : i + BATCH_SIZE]
-        tqdm.write(f"\n--- 正在处理批次 {i//BATCH_SIZE + 1}/{len(all_pmids)//BATCH_SIZE + 1} (大小: {len(batch_pmids)}) ---")
-        
-        # 调用API获取这批PMID的MeSH
-        batch_results = fetch_mesh_in_batches(batch_pmids)
-        final_mesh_map.update(batch_results)
-        
-        tqdm.write(f"--- 批次处理完成 ---")
-        
-        # E-utilities 允许每秒最多10个请求（如果有API Key）
-        # 我们在每批之间暂停1秒，保持友好
-        time.sleep(1)
+    # 多个批次并发请求（由限速器保证总请求频率不超过 NCBI 限制），使用tqdm显示批次处理进度
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        future_to_batch = {
+            executor.submit(fetch_mesh_in_batches, batch_pmids): batch_no
+            for batch_no, batch_pmids in enumerate(batches, 1)
+        }
+        for future in tqdm(as_completed(future_to_batch), total=len(batches), desc="Processing Batches"):
+            batch_no = future_to_batch[future]
+            batch_results = future.result()
+            final_mesh_map.update(batch_results)
+            # 每个批次完成后立即写入缓存，失败的批次不会影响已获取的结果
+            save_cached_mesh(batch_results)
+            tqdm.write(f"--- 批次 {batch_no}/{len(batches)} 处理完成 (获取 {len(batch_results)} 篇) ---")
 
     print("\n所有批次处理完毕。")
 
@@ -129,10 +183,9 @@ def main():
     # df['PMID'] 已经是字符串了
     # 我们使用 .map() 函数，根据 final_mesh_map 字典来填充新列
     print("正在将 MeSH 词条映射回 DataFrame...")
-    df['MeSH_API'] = df['PMID'].map(final_mesh_map)
-    
-    # 替换那些可能在API中没有返回（或失败）的条目为 '[]'
-    df['MeSH_API'] = df['MeSH_API'].apply(lambda x: x if isinstance(x, list) else [])
+    # 那些可能在API中没有返回（或失败）的条目记为 '[]'
+    # 以JSON列表字符串保存，下游可用 json.loads 快速解析（也兼容 literal_eval）
+    df['MeSH_API'] = df['PMID'].map(lambda pmid: json.dumps(final_mesh_map.get(pmid, []), ensure_ascii=False))
 
     # --- 4. 保存回原文件 ---
     try:
@@ -1,8 +1,14 @@
 import pandas as pd
+import os
 import ast
-import difflib
+import json
 import re
 import numpy as np
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from multiprocessing import Pool
+from rapidfuzz import fuzz, process
+from csv_encoding_utils import read_csv_with_fallback  # 公共的编码检测与回退读取
 
 # ================== 关键配置 ==================
 EXCLUDE_KEYWORDS = [
@@ -30,36 +36,63 @@ EXCLUDE_KEYWORDS = [
     'Quality of Life'
 ]
 SIMILARITY_THRESHOLD = 0.6
+# rapidfuzz 的相似度为 0-100 分
+SIMILARITY_CUTOFF = SIMILARITY_THRESHOLD * 100
 MAX_KEYWORDS = 5
 
+# 并行处理论文的进程数及每次分发给进程的论文数
+MAX_PROCESSES = os.cpu_count() or 1
+PROCESS_CHUNKSIZE = 256
+
+PUNCT_PATTERN = re.compile(r'[^\w\s]')
+# ASCII 标点删除表（与 PUNCT_PATTERN 在ASCII范围内等价，保留字母、数字、下划线和空白）
+ASCII_PUNCT_TABLE = str.maketrans('', '', ''.join(
+    ch for ch in map(chr, range(128))
+    if not (ch.isalnum() or ch == '_' or ch.isspace())
+))
+
+@lru_cache(maxsize=4096)
 def clean_keyword(kw):
-    """清洗关键词（去除标点、转小写、去空格）"""
-    return re.sub(r'[^\w\s]', '', kw).lower().strip()
+    """清洗关键词（去除标点、转小写、去空格），相同词只清洗一次"""
+    # 纯ASCII词用查表删除标点，含非ASCII字符时回退到正则以正确处理Unicode标点
+    if kw.isascii():
+        return kw.translate(ASCII_PUNCT_TABLE).lower().strip()
+    return PUNCT_PATTERN.sub('', kw).lower().strip()
+
+# 预先清洗排除词（模块加载时计算一次，集合查找为O(1)）
+CLEAN_EXCLUDES = frozenset(clean_keyword(excl) for excl in EXCLUDE_KEYWORDS)
+
+# 排除词按长度排序，用于相似度计算前的长度预筛选
+EXCLUDES_BY_LENGTH = sorted(CLEAN_EXCLUDES, key=len)
+EXCLUDE_LENGTHS = [len(term) for term in EXCLUDES_BY_LENGTH]
 
-def is_similar_to_excluded(clean_term, exclude_list, threshold=SIMILARITY_THRESHOLD):
-    """检查当前清洗后的词是否与排除列表中任何词的相似度≥阈值"""
-    if not exclude_list:  # 排除列表为空时直接返回False
+def is_similar_to_excluded(clean_term, threshold=SIMILARITY_THRESHOLD):
+    """检查当前清洗后的词是否与（已清洗的）排除词中任何词的相似度≥阈值"""
+    # fuzz.ratio ≤ 2·min(la, lb)/(la + lb)，长度相差过大的排除词不可能达标，先按长度二分筛掉
+    length = len(clean_term)
+    lo = bisect_left(EXCLUDE_LENGTHS, length * threshold / (2 - threshold) - 1e-9)
+    hi = bisect_right(EXCLUDE_LENGTHS, length * (2 - threshold) / threshold + 1e-9)
+    candidates = EXCLUDES_BY_LENGTH[lo:hi]
+    if not candidates:  # 没有长度相近的排除词时直接返回False
         return False
-    # 计算与排除列表中每个词的相似度
-    for excl in exclude_list:
-        clean_excl = clean_keyword(excl)
-        similarity = difflib.SequenceMatcher(None, clean_term, clean_excl).ratio()
-        if similarity >= threshold:
-            return True  # 有一个相似即返回True
-    return False  # 所有都不相似返回False
+    # 有一个相似即返回True（extractOne 在C层逐个比较，低于阈值的候选直接舍弃）
+    return process.extractOne(clean_term, candidates, scorer=fuzz.ratio, score_cutoff=threshold * 100) is not None
 
-def process_paper(row):
-    # 解析关键词（处理空值）
+def parse_list_cell(value):
+    """解析列表字符串（处理空值，优先用json.loads，旧版单引号列表回退到literal_eval，解析失败时返回空列表）"""
+    if pd.isna(value):
+        return []
     try:
-        keywords = ast.literal_eval(row['Keywords']) if pd.notna(row['Keywords']) else []
-    except:
-        keywords = []
-    
+        return json.loads(value)
+    except (TypeError, ValueError):
+        pass
     try:
-        mesh_terms = ast.literal_eval(row['MeSH_API']) if pd.notna(row['MeSH_API']) else []
-    except:
-        mesh_terms = []
-    
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError, TypeError, MemoryError, RecursionError):
+        return []
+
+def process_paper(keywords, mesh_terms):
+    """根据一篇论文已解析的 Keywords 与 MeSH_API 列表筛选关键词（不依赖行Series，可直接按列调用）"""
     # 情况1：两者都为空 → 跳过
     if not keywords and not mesh_terms:
         return []
@@ -69,8 +102,8 @@ def process_paper(row):
         clean_mesh = [clean_keyword(term) for term in mesh_terms]
         valid_mesh = [
             term for term, clean in zip(mesh_terms, clean_mesh)
-            if clean not in [clean_keyword(excl) for excl in EXCLUDE_KEYWORDS]  # 不在排除列表中
-            and not is_similar_to_excluded(clean, EXCLUDE_KEYWORDS)  # 与排除词相似度低于阈值
+            if clean not in CLEAN_EXCLUDES  # 不在排除列表中
+            and not is_similar_to_excluded(clean)  # 与排除词相似度低于阈值
         ]
         valid_mesh.sort(key=lambda x: len(x), reverse=True)  # 按长度倒序
         return valid_mesh[:MAX_KEYWORDS]
@@ -79,35 +112,34 @@ def process_paper(row):
     if not mesh_terms and keywords:
         valid_keywords = [
             term for term in keywords
-            if clean_keyword(term) not in [clean_keyword(excl) for excl in EXCLUDE_KEYWORDS]
-            and not is_similar_to_excluded(clean_keyword(term), EXCLUDE_KEYWORDS)
+            if clean_keyword(term) not in CLEAN_EXCLUDES
+            and not is_similar_to_excluded(clean_keyword(term))
         ]
         return valid_keywords[:MAX_KEYWORDS]
     
     # 情况4：两者都不为空（仅保留相似度匹配的关键词，不补充剩余）
-    clean_keywords = [clean_keyword(kw) for kw in keywords]
-    clean_mesh = [clean_keyword(term) for term in mesh_terms]
+    # 跳过排除词及相似词
+    valid_keywords = []
+    valid_clean_keywords = []
+    for kw in keywords:
+        clean_kw = clean_keyword(kw)
+        if clean_kw in CLEAN_EXCLUDES or is_similar_to_excluded(clean_kw):
+            continue
+        valid_keywords.append(kw)
+        valid_clean_keywords.append(clean_kw)
     
-    matched_keywords = []
-    matched_clean = set()  # 记录已匹配的Mesh词（避免重复）
+    valid_clean_mesh = [
+        clean_mesh_term for clean_mesh_term in map(clean_keyword, mesh_terms)
+        if clean_mesh_term not in CLEAN_EXCLUDES and not is_similar_to_excluded(clean_mesh_term)
+    ]
     
-    # 仅提取关键词与Mesh中相似度达标的词
-    for kw, clean_kw in zip(keywords, clean_keywords):
-        # 跳过排除词及相似词
-        if clean_kw in [clean_keyword(excl) for excl in EXCLUDE_KEYWORDS] or is_similar_to_excluded(clean_kw, EXCLUDE_KEYWORDS):
-            continue
-            
-        for mesh, clean_mesh_term in zip(mesh_terms, clean_mesh):
-            # 跳过排除词及相似词
-            if clean_mesh_term in [clean_keyword(excl) for excl in EXCLUDE_KEYWORDS] or is_similar_to_excluded(clean_mesh_term, EXCLUDE_KEYWORDS):
-                continue
-                
-            # 计算关键词与Mesh词的相似度
-            similarity = difflib.SequenceMatcher(None, clean_kw, clean_mesh_term).ratio()
-            if similarity >= SIMILARITY_THRESHOLD:
-                matched_keywords.append(kw)
-                matched_clean.add(clean_mesh_term)  # 标记为已匹配，避免重复
-                break  # 匹配到一个后跳出当前Mesh循环，避免同一关键词匹配多个Mesh词
+    if not valid_keywords or not valid_clean_mesh:
+        return []
+    
+    # 一次性计算关键词×Mesh词的相似度矩阵，仅保留与任一Mesh词相似度达标的关键词
+    scores = process.cdist(valid_clean_keywords, valid_clean_mesh, scorer=fuzz.ratio, score_cutoff=SIMILARITY_CUTOFF)
+    matched_rows = (scores >= SIMILARITY_CUTOFF).any(axis=1)
+    matched_keywords = [kw for kw, matched in zip(valid_keywords, matched_rows) if matched]
     
     # 直接返回匹配结果（不补充，最多取MAX_KEYWORDS个）
     return matched_keywords[:MAX_KEYWORDS]
@@ -115,14 +147,8 @@ def process_paper(row):
 def main():
     input_path = "output/pubmed_results_with_keywords.csv"
     
-    # 尝试多种编码解决解码错误
-    try:
-        df = pd.read_csv(input_path, encoding='utf-8-sig')
-    except UnicodeDecodeError:
-        try:
-            df = pd.read_csv(input_path, encoding='latin-1')
-        except UnicodeDecodeError:
-            df = pd.read_csv(input_path, encoding='cp1252')
+    # 先检测编码再读取，避免逐个尝试编码时重复解析整个文件（解码失败时回退到 GBK、Latin-1）
+    df = read_csv_with_fallback(input_path, dtype={'PMID': str})
     
     # 删除所有以"Unnamed"开头的空列
     df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
@@ -130,14 +156,25 @@ def main():
     if 'Keywords_and_MeSH_terms' not in df.columns:
         df['Keywords_and_MeSH_terms'] = np.nan
     
-    df['Keywords_and_MeSH_terms'] = df.apply(process_paper, axis=1)
+    # 先整列解析一次列表字符串，再按列zip逐篇处理（避免apply(axis=1)逐行构造Series）
+    keywords_col = df['Keywords'].map(parse_list_cell)
+    mesh_col = df['MeSH_API'].map(parse_list_cell)
+    pairs = list(zip(keywords_col.values, mesh_col.values))
+    
+    # 各篇论文互不依赖且为CPU密集计算，分发到多个进程并行处理（starmap保持原有行顺序）
+    # 排除词等配置均为模块级常量，子进程导入/继承后即可使用
+    with Pool(processes=MAX_PROCESSES) as pool:
+        results = pool.starmap(process_paper, pairs, chunksize=PROCESS_CHUNKSIZE)
+    # 以JSON列表字符串保存（兼容下游的 literal_eval 解析）
+    df['Keywords_and_MeSH_terms'] = [json.dumps(terms, ensure_ascii=False) for terms in results]
     
     # 保存结果
     output_path = "output/pubmed_results_with_keywords_processed.csv"
     df.to_csv(output_path, index=False, encoding='utf-8-sig')
     
     print(f"处理完成！结果已保存至: {output_path}")
-    print(f"共处理 {len(df)} 篇论文，其中 {len(df[df['Keywords_and_MeSH_terms'].apply(len) == 0])} 篇跳过（两者为空或无匹配关键词）")
+    skipped = sum(1 for terms in results if not terms)
+    print(f"共处理 {len(df)} 篇论文，其中 {skipped} 篇跳过（两者为空或无匹配关键词）")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,9 +1,19 @@
 import pandas as pd
 import plotly.express as px
+import plotly.io as pio
 import pycountry
 import numpy as np  # 用于对数变换
-from collections import Counter  # 用于统计国家名出现次数
 import os  # 新增：用于创建文件夹
+import io
+import sys
+import pickle
+import json
+import hashlib
+from importlib import metadata
+from PIL import Image  # 用于将PNG转换为TIF
+from concurrent.futures import ThreadPoolExecutor
+
+from eps_export_utils import cairosvg  # 可选依赖（已安装但不可用时为None）：用于SVG→EPS/PNG转换
 
 # --------------------------
 # 0. 自动创建保存目录
@@ -14,38 +24,8 @@ for directory in output_dirs:
         os.makedirs(directory)
         print(f"✅ 已创建目录: ./{directory}")
 
-# 读取数据
-# 确保文件存在，防止路径报错
-input_file = "./output/author_info_processed_updated.csv"
-if not os.path.exists(input_file):
-    print(f"❌ 未找到输入文件: {input_file}")
-    exit()
-    
-df = pd.read_csv(input_file)
-
-# 统计总作者数量（去重）
-total_authors = df["Author"].nunique()
-
-# --------------------------
-# 处理国家名称前缀
-# --------------------------
-def clean_country_prefix(country_str):
-    """移除国家字符串中的"国家："和"国家:"前缀"""
-    if not isinstance(country_str, str):  # 处理非字符串类型（如NaN）
-        return str(country_str)
-    
-    cleaned = country_str.replace("国家：", "").replace("国家:", "")
-    return cleaned
-
-# 1. 清洗前缀
-df["Country_Cleaned_Prefix"] = df["Country"].apply(clean_country_prefix)
-
-# 2. 去空格处理
-df["Country_Raw"] = df["Country_Cleaned_Prefix"].astype(str).str.strip()
-df["Country"] = df["Country_Raw"].copy()
-
 # --------------------------
-# 收集未识别的国家名
+# 国家名映射表
 # --------------------------
 country_mapping = {
     "People's Republic of China": "China",
@@ -72,52 +52,130 @@ country_mapping = {
     "Democratic Republic of Congo": "Congo"
 }
 
-raw_country_counts = Counter(df["Country_Raw"])
+# 预先建立 pycountry 可识别名称（代码、名称、正式名称、通用名称，均不区分大小写）到标准国家名的映射，
+# 与 pycountry.countries.lookup 的匹配规则一致，之后判断是否可识别只需一次字典查找
+pycountry_name_lookup = {}
+for record in pycountry.countries:
+    for attr in ("alpha_2", "alpha_3", "numeric", "name", "official_name", "common_name"):
+        value = getattr(record, attr, None)
+        if value:
+            pycountry_name_lookup.setdefault(value.lower(), record.name)
 
-unrecognized_countries = []
-for country in raw_country_counts.keys():
-    can_pycountry_recognize = False
-    try:
-        pycountry.countries.lookup(country)
-        can_pycountry_recognize = True
-    except LookupError:
-        pass
-    
-    in_mapping_table = (country in country_mapping.keys()) or (country in country_mapping.values())
-    
-    if not can_pycountry_recognize and not in_mapping_table:
-        unrecognized_countries.append({
-            "Raw_Country_Name": country,
-            "Appearance_Count": raw_country_counts[country],
-            "Author_Count": df[df["Country_Raw"] == country]["Author"].nunique()
-        })
-
-unrecognized_df = pd.DataFrame(unrecognized_countries)
-if not unrecognized_df.empty:
-    unrecognized_df = unrecognized_df.sort_values("Appearance_Count", ascending=False).reset_index(drop=True)
-    unrecognized_save_path = "./output/unrecognized_countries.csv"
-    unrecognized_df.to_csv(unrecognized_save_path, index=False, encoding="utf-8-sig")
-    print(f"✅ 已收集 {len(unrecognized_df)} 个未识别的国家名，保存至：")
-    print(f"   {unrecognized_save_path}\n")
-else:
-    print("✅ 所有国家名都能被识别或已在手动映射表中\n")
+def clean_country_names(countries):
+    """
+    移除国家字符串中的"国家："和"国家:"前缀并去除首尾空格（非字符串类型如NaN先转为字符串）
+    只对不重复的原始国家名清洗一次，再按编码映射回整列，返回分类类型
+    """
+    raw_codes, raw_names = pd.factorize(countries, use_na_sentinel=False)
+    cleaned_names = (
+        pd.Index(raw_names).astype(str)
+        .str.replace("国家：", "", regex=False)
+        .str.replace("国家:", "", regex=False)
+        .str.strip()
+    )
+    # 不同的原始名清洗后可能相同（如"国家：China"与"China"），再去重一次得到最终分类
+    cleaned_codes, categories = pd.factorize(cleaned_names)
+    return pd.Series(
+        pd.Categorical.from_codes(cleaned_codes[raw_codes], categories),
+        index=countries.index
+    )
+
+# --------------------------
+# 收集未识别的国家名
+# --------------------------
+def report_unrecognized_countries(df):
+    """统计既不能被 pycountry 识别、也不在手动映射表中的国家名，保存至 output 目录"""
+    # 一次分组同时统计每个国家名的出现次数与作者数
+    country_stats = df.groupby("Country_Raw", observed=True).agg(
+        Appearance_Count=("Author", "size"),  # size 计入所有行（含作者为空的行），即该国家名的出现次数
+        Author_Count=("Author", "nunique")
+    )
+    country_names = country_stats.index.astype(str)
+
+    # pycountry 可识别（不区分大小写），或在手动映射表的原始名/标准名中的国家名视为已识别
+    mapping_names = set(country_mapping) | set(country_mapping.values())
+    recognized = country_names.str.lower().isin(pycountry_name_lookup.keys()) | country_names.isin(mapping_names)
+
+    unrecognized_df = country_stats.loc[~recognized].rename_axis("Raw_Country_Name").reset_index()
+    unrecognized_df["Raw_Country_Name"] = unrecognized_df["Raw_Country_Name"].astype(str)
+    if not unrecognized_df.empty:
+        unrecognized_df = unrecognized_df.sort_values("Appearance_Count", ascending=False).reset_index(drop=True)
+        unrecognized_save_path = "./output/unrecognized_countries.csv"
+        unrecognized_df.to_csv(unrecognized_save_path, index=False, encoding="utf-8-sig")
+        print(f"✅ 已收集 {len(unrecognized_df)} 个未识别的国家名，保存至：")
+        print(f"   {unrecognized_save_path}\n")
+    else:
+        print("✅ 所有国家名都能被识别或已在手动映射表中\n")
 
 # --------------------------
 # 国家标准化
 # --------------------------
 def standardize_country(name):
+    """优先使用 pycountry 标准名，其次手动映射表，都无法识别时返回 Unknown（纯字典查找，不抛出异常）"""
+    return pycountry_name_lookup.get(name.lower()) or country_mapping.get(name, "Unknown")
+
+def load_country_cache(cache_path, cache_key):
+    """读取已清洗并标准化国家名的作者数据缓存，输入文件未变化时直接复用"""
+    if not os.path.exists(cache_path):
+        return None
     try:
-        return pycountry.countries.lookup(name).name
-    except LookupError:
+        with open(cache_path, 'rb') as f:
+            cached = pickle.load(f)
+        if cached.get('input_key') == cache_key:
+            return cached['df']
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
         pass
-    if name in country_mapping:
-        return country_mapping[name]
-    return "Unknown"
+    return None
+
+def save_country_cache(df, cache_path, cache_key):
+    """保存清洗并标准化后的作者数据（只保留绘图需要的列）"""
+    with open(cache_path, 'wb') as f:
+        pickle.dump({'input_key': cache_key, 'df': df[["Author", "Country", "Standardized_Country"]]}, f)
+
+# 读取数据
+# 确保文件存在，防止路径报错
+input_file = "./output/author_info_processed_updated.csv"
+if not os.path.exists(input_file):
+    print(f"❌ 未找到输入文件: {input_file}")
+    exit()
+
+# 输入文件（修改时间与大小）、手动映射表和 pycountry 版本都未变化时，直接复用上次清洗和标准化的结果
+# （补充 country_mapping 后重新运行会使缓存失效，从而重新生成未识别国家名报告）
+country_cache = "./output/author_country_cache.pkl"
+mapping_digest = hashlib.sha1(
+    json.dumps(country_mapping, sort_keys=True, ensure_ascii=False).encode("utf-8")
+).hexdigest()
+try:
+    pycountry_version = metadata.version("pycountry")
+except metadata.PackageNotFoundError:
+    pycountry_version = None
+cache_key = (os.path.getmtime(input_file), os.path.getsize(input_file), mapping_digest, pycountry_version)
+df = load_country_cache(country_cache, cache_key)
+if df is not None:
+    print(f"♻️ 已从缓存加载国家标准化结果: {country_cache}\n")
+else:
+    df = pd.read_csv(input_file)
+    
+    # 1. 清洗前缀  2. 去空格处理
+    # 国家名重复度高，保存为分类类型后分组、计数和映射都基于整数编码进行
+    df["Country_Raw"] = clean_country_names(df["Country"])
+    df["Country"] = df["Country_Raw"].copy()
+    
+    report_unrecognized_countries(df)
+    
+    # 只对不重复的国家名（分类）标准化一次，再整列映射回去
+    standardized_lookup = {name: standardize_country(name) for name in df["Country"].cat.categories}
+    df["Standardized_Country"] = df["Country"].map(standardized_lookup).astype("category")
+    save_country_cache(df, country_cache, cache_key)
 
-df["Standardized_Country"] = df["Country"].apply(standardize_country)
+# 统计总作者数量（去重）
+total_authors = df["Author"].nunique()
 
-# 统计有效作者数量
-mapped_authors = df[df["Standardized_Country"] != "Unknown"]["Author"].nunique()
+# 统计有效作者数量（只保留国家可识别的记录，后续按国家统计也只在这部分数据上进行）
+# 先对 (国家, 作者) 去重一次，有效作者总数与各国作者数都基于这份去重结果
+known_authors = df.loc[df["Standardized_Country"] != "Unknown", ["Standardized_Country", "Author"]]
+author_pairs = known_authors.dropna(subset=["Author"]).drop_duplicates()
+mapped_authors = author_pairs["Author"].nunique()
 unknown_authors = total_authors - mapped_authors
 
 print(f"数据中总共有 {total_authors} 位作者")
@@ -128,49 +186,85 @@ print(f"有效识别率: {mapped_authors / total_authors:.2%}\n")
 # --------------------------
 # 通用绘图保存函数
 # --------------------------
+def save_eps(fig_dict, svg_bytes, eps_path):
+    """由已渲染的SVG直接转换得到EPS，避免再次渲染；未安装 cairosvg 时回退为 kaleido 导出"""
+    if cairosvg is not None:
+        cairosvg.svg2eps(bytestring=svg_bytes, write_to=eps_path)
+    else:
+        pio.write_image(fig_dict, eps_path, format="eps", validate=False)
+
+def save_tif(fig_dict, svg_bytes, tif_path, scale=4):
+    """
+    kaleido 不支持直接导出TIF，先得到PNG再由Pillow在内存中转换；
+    安装了 cairosvg 时直接将已渲染的SVG按比例栅格化，省去一次 kaleido 渲染
+    """
+    if cairosvg is not None:
+        png_bytes = cairosvg.svg2png(bytestring=svg_bytes, scale=scale)
+    else:
+        png_bytes = pio.to_image(fig_dict, format="png", scale=scale, validate=False)
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        image.save(tif_path, format="TIFF", compression="tiff_lzw")
+
 def save_plot(fig, filename_base):
     """
     保存 Plotly 图表为 html, svg, eps, tif 四种格式
     fig: Plotly Figure 对象
     filename_base: 文件名（不带后缀），例如 'author_distribution'
     """
+    # 导出过程中只收集状态信息，结束后一次性输出
+    messages = []
     try:
-        # 1. 保存 HTML
         html_path = f"./html/{filename_base}.html"
-        fig.write_html(html_path)
-        print(f"✅ HTML 已保存: {html_path}")
-
-        # 2. 保存 SVG
         svg_path = f"./svg/{filename_base}.svg"
-        fig.write_image(svg_path)
-        print(f"✅ SVG 已保存: {svg_path}")
-
-        # 3. 保存 EPS
         eps_path = f"./eps/{filename_base}.eps"
-        fig.write_image(eps_path)
-        print(f"✅ EPS 已保存: {eps_path}")
-
-        # 4. 保存 TIF (scale=4 提升分辨率，约等于300dpi)
         tif_path = f"./tif/{filename_base}.tif"
-        fig.write_image(tif_path, scale=4)
-        print(f"✅ TIF 已保存: {tif_path}")
+
+        # 图表只转换并校验一次为字典，之后各格式的导出都直接使用它（validate=False 跳过重复校验）
+        fig_dict = fig.to_dict()
+
+        # 1. 保存 SVG（只用 kaleido 渲染一次矢量图，EPS/TIF 由它转换得到）
+        svg_bytes = pio.to_image(fig_dict, format="svg", validate=False)
+        with open(svg_path, "wb") as f:
+            f.write(svg_bytes)
+        messages.append(f"✅ SVG 已保存: {svg_path}")
+
+        # 2. HTML、EPS、TIF (scale=4 提升分辨率，约等于300dpi) 互不依赖，并发导出
+        # kaleido 进程内部对渲染请求加锁，多线程共享同一个 kaleido 进程是安全的
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            export_futures = [
+                # HTML 通过CDN引用 plotly.js，不在每个文件中嵌入约3MB的脚本
+                ("HTML", html_path, executor.submit(pio.write_html, fig_dict, html_path, include_plotlyjs="cdn", include_mathjax=False, validate=False)),
+                ("EPS", eps_path, executor.submit(save_eps, fig_dict, svg_bytes, eps_path)),
+                ("TIF", tif_path, executor.submit(save_tif, fig_dict, svg_bytes, tif_path, 4)),
+            ]
+            for label, path, future in export_futures:
+                future.result()
+                messages.append(f"✅ {label} 已保存: {path}")
         
     except Exception as e:
-        print(f"❌ 保存图片 {filename_base} 时发生错误: {e}")
-        print("提示: 导出静态图片需安装 kaleido 库 (pip install -U kaleido)")
+        messages.append(f"❌ 保存图片 {filename_base} 时发生错误: {e}")
+        messages.append("提示: 导出静态图片需安装 kaleido 库 (pip install -U kaleido)")
+
+    sys.stdout.write("\n".join(messages) + "\n")
+    sys.stdout.flush()
 
 # --------------------------
 # 图1：世界地图可视化（优化颜色条刻度） 
 # --------------------------
-author_counts = df.groupby("Standardized_Country")["Author"].nunique().reset_index()
+# (国家, 作者) 已去重，每个国家的作者数即为分组行数（已排除 Unknown 国家）
+# observed=True：只统计实际出现的国家（分类中的 Unknown 已被过滤，不应以0人出现）
+author_counts = author_pairs.groupby("Standardized_Country", observed=True).size().reset_index(name="Author_Count")
 author_counts.columns = ["Country", "Author_Count"]
-author_counts["Log_Author_Count"] = np.log1p(author_counts["Author_Count"])  # 保持对数变换用于绘图
+# 国家数量很少，转回普通字符串便于后续映射大洲和绘图
+author_counts["Country"] = author_counts["Country"].astype(str)
+author_counts["Log_Author_Count"] = np.log1p(author_counts["Author_Count"].to_numpy())  # 保持对数变换用于绘图
 
-log_ticks = [0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12]
-raw_ticks = [int(np.expm1(tick)) for tick in log_ticks]
+log_ticks = np.arange(13)
+raw_ticks = np.expm1(log_ticks).astype(np.int64).tolist()
 
+# 只把绘图用到的列交给 Plotly，减小图表JSON体积
 fig1 = px.choropleth(
-    author_counts[author_counts["Country"] != "Unknown"],
+    author_counts[["Country", "Author_Count", "Log_Author_Count"]],
     locations="Country",
     locationmode="country names",
     color="Log_Author_Count",
@@ -196,8 +290,7 @@ print("-" * 30)
 # --------------------------
 # 图2：国家条形图可视化
 # --------------------------
-sorted_known_counts = author_counts[author_counts["Country"] != "Unknown"] \
-                          .sort_values(by=["Author_Count", "Country"], ascending=[False, True])
+sorted_known_counts = author_counts[["Country", "Author_Count"]].sort_values(by=["Author_Count", "Country"], ascending=[False, True])
 top20_known_counts = sorted_known_counts.head(20).reset_index(drop=True)
 
 fig2 = px.bar(
@@ -208,7 +301,6 @@ fig2 = px.bar(
     color_continuous_scale="Reds",
     title="各国小儿外科专家人数分布（前20名已知国家）",
     labels={"Author_Count": "作者人数", "Country": "国家"},
-    hover_data=["Author_Count"],
     text_auto=".0f"
 )
 
@@ -316,22 +408,19 @@ country_to_continent = {
     "Antarctica": "Antarctica", "French Southern Territories": "Antarctica", "Bouvet Island": "Antarctica"
 }
 
-author_counts["Continent"] = author_counts["Country"].apply(
-    lambda x: country_to_continent.get(x, "Other") if x != "Unknown" else "Unknown"
-)
+author_counts["Continent"] = author_counts["Country"].map(country_to_continent).fillna("Other")
 
 continent_counts = author_counts.groupby("Continent")["Author_Count"].sum().reset_index()
 continent_counts = continent_counts.sort_values(by="Author_Count", ascending=False).reset_index(drop=True)
 
 fig3 = px.bar(
-    continent_counts[~continent_counts["Continent"].isin(["Unknown", "Other"])],
+    continent_counts[continent_counts["Continent"] != "Other"],
     x="Continent",
     y="Author_Count",
     color="Author_Count",
     color_continuous_scale="Reds",
     title="各大洲小儿外科专家人数分布",
     labels={"Author_Count": "作者人数", "Continent": "大洲"},
-    hover_data=["Author_Count"],
     text_auto=".0f"
 )
 
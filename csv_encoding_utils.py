@@ -0,0 +1,38 @@
+import pandas as pd
+try:
+    import cchardet as chardet  # 可选依赖：C实现的编码检测，速度远快于chardet
+except ImportError:
+    import chardet  # 用于检测文件编码
+
+# 检测编码时读取的文件开头样本大小
+ENCODING_SAMPLE_SIZE = 65536
+# 检测到的编码解码失败时依次尝试的编码（样本之后可能出现GBK字节；latin-1可解码任意字节，放在最后）
+FALLBACK_ENCODINGS = ('gbk', 'latin-1')
+
+def detect_file_encoding(file_path, sample_size=ENCODING_SAMPLE_SIZE):
+    """检测文件编码格式（BOM或纯ASCII可直接判定时不调用chardet）"""
+    with open(file_path, 'rb') as f:
+        raw_data = f.read(sample_size)
+    if raw_data.startswith(b'\xef\xbb\xbf'):
+        return 'utf-8-sig'
+    if raw_data[:2] in (b'\xff\xfe', b'\xfe\xff'):
+        return 'utf-16'
+    if raw_data.isascii():
+        return 'utf-8'
+    result = chardet.detect(raw_data)
+    return result['encoding'] or 'utf-8'
+
+def read_csv_with_fallback(file_path, encoding=None, **read_csv_kwargs):
+    """
+    按检测到（或指定）的编码读取CSV，解码失败时依次回退到 GBK、Latin-1
+    其余参数原样传给 pd.read_csv
+    """
+    if encoding is None:
+        encoding = detect_file_encoding(file_path)
+    candidates = [encoding] + [enc for enc in FALLBACK_ENCODINGS if enc != encoding.lower()]
+    for candidate in candidates[:-1]:
+        try:
+            return pd.read_csv(file_path, encoding=candidate, **read_csv_kwargs)
+        except UnicodeDecodeError:
+            print(f"警告：使用编码 {candidate} 读取 {file_path} 失败，尝试下一种编码")
+    return pd.read_csv(file_path, encoding=candidates[-1], **read_csv_kwargs)
@@ -0,0 +1,15 @@
+try:
+    import cairosvg  # 可选依赖：用于SVG→EPS转换
+except (ImportError, OSError):  # 已安装 cairosvg 但缺少系统 cairo 库时导入会抛出 OSError
+    cairosvg = None
+
+def save_eps_from_svg(svg_path, eps_path, **savefig_kwargs):
+    """
+    由已保存的SVG直接转换得到EPS，避免matplotlib第二次完整渲染；
+    未安装 cairosvg 时回退为 plt.savefig 导出EPS（导出当前图形）
+    """
+    if cairosvg is not None:
+        cairosvg.svg2eps(url=svg_path, write_to=eps_path)
+    else:
+        import matplotlib.pyplot as plt  # 仅回退时需要，只用 cairosvg 的脚本（如9）无需依赖 matplotlib
+        plt.savefig(eps_path, format='eps', **savefig_kwargs)
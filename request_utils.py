@@ -0,0 +1,29 @@
+import random
+import threading
+import time
+
+def retry_delay(retry_count, response=None, cap=30):
+    """失败重试的等待时间：优先遵循服务端的Retry-After，否则指数退避并加少量随机抖动"""
+    if response is not None:
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return min(float(retry_after), cap)
+            except ValueError:
+                pass
+    return min(1.5 ** retry_count + random.random() * 0.25, cap)
+
+class RateLimiter:
+    """线程安全的限速器，保证所有线程合计的请求间隔不小于 1/rate 秒"""
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.next_time = time.monotonic()
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            wait_time = self.next_time - now
+            self.next_time = max(now, self.next_time) + self.interval
+        if wait_time > 0:
+            time.sleep(wait_time)